@@ -2,20 +2,39 @@
 """
 Remove border="1" from HTML tables in markdown files.
 """
+
+import os
 import re
+import shutil
+import tempfile
+
+_BORDER_RE = re.compile(rb'<table\s+border="1"')
 
 
 def clean_markdown_file(filepath):
     """Remove border='1' attribute from HTML tables."""
-    with open(filepath, "r") as f:
-        content = f.read()
+    directory = os.path.dirname(os.path.abspath(filepath))
 
-    # Remove border="1" from table tags
-    content = re.sub(r'<table\s+border="1"', "<table", content)
+    # Stream line by line into a temporary file next to the original, then
+    # atomically replace it, so the document is never held in memory twice.
+    # The markup being rewritten is ASCII, so work on bytes and skip the
+    # decode/encode round-trip.
+    with tempfile.NamedTemporaryFile("wb", dir=directory, delete=False) as dst:
+        tmp_path = dst.name
+    try:
+        with open(filepath, "rb") as src, open(tmp_path, "wb") as dst:
+            for line in src:
+                # Remove border="1" from table tags (skip the regex scan if absent)
+                if b'border="1"' in line:
+                    line = _BORDER_RE.sub(b"<table", line)
+                dst.write(line)
 
-    # Write back the cleaned content
-    with open(filepath, "w") as f:
-        f.write(content)
+        # Keep the original permissions rather than the temp file's 0600
+        shutil.copymode(filepath, tmp_path)
+        os.replace(tmp_path, filepath)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
 
     print(f"Removed border='1' from tables in {filepath}")
 
@@ -4,15 +4,30 @@ BIQL - BIDS Query Language
 A powerful query language for Brain Imaging Data Structure (BIDS) datasets.
 """
 
+import importlib
+from typing import TYPE_CHECKING
+
 __version__ = "0.3.0"
 __author__ = "Ashley Stewart"
 
-from .dataset import BIDSDataset
-from .evaluator import BIQLEvaluator
-from .formatter import BIQLFormatter
-from .parser import BIQLParser
-from .query import BIQLQuery, create_query_engine
-from .utils import create_example_dataset
+if TYPE_CHECKING:
+    from .dataset import BIDSDataset
+    from .evaluator import BIQLEvaluator
+    from .formatter import BIQLFormatter
+    from .parser import BIQLParser
+    from .query import BIQLQuery, create_query_engine
+    from .utils import create_example_dataset
+
+# Public names and the submodule that defines them; imported on first access
+_LAZY_IMPORTS = {
+    "BIQLParser": "parser",
+    "BIQLEvaluator": "evaluator",
+    "BIDSDataset": "dataset",
+    "BIQLFormatter": "formatter",
+    "BIQLQuery": "query",
+    "create_query_engine": "query",
+    "create_example_dataset": "utils",
+}
 
 __all__ = [
     "BIQLParser",
@@ -23,3 +38,18 @@ __all__ = [
     "create_query_engine",
     "create_example_dataset",
 ]
+
+
+def __getattr__(name):
+    """Lazily import public names from their submodules (PEP 562)"""
+    if name in _LAZY_IMPORTS:
+        module = importlib.import_module(f".{_LAZY_IMPORTS[name]}", __name__)
+        value = getattr(module, name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    """List public names, including those not imported yet"""
+    return sorted(list(globals()) + list(_LAZY_IMPORTS))
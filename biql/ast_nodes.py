@@ -2,20 +2,24 @@
 Abstract Syntax Tree (AST) node definitions for BIQL
 """
 
+import sys
 from dataclasses import dataclass
 from typing import Any, List, Optional, Tuple
 
 from .lexer import TokenType
 
+# Slotted nodes are smaller and faster to read; dataclass slots need 3.10+
+_NODE_OPTIONS = {"slots": True} if sys.version_info >= (3, 10) else {}
 
-@dataclass
+
+@dataclass(**_NODE_OPTIONS)
 class ASTNode:
     """Base class for all AST nodes"""
 
     pass
 
 
-@dataclass
+@dataclass(**_NODE_OPTIONS)
 class SelectClause(ASTNode):
     """SELECT clause with list of items and optional aliases"""
 
@@ -23,21 +27,21 @@ class SelectClause(ASTNode):
     distinct: bool = False
 
 
-@dataclass
+@dataclass(**_NODE_OPTIONS)
 class WhereClause(ASTNode):
     """WHERE clause with condition expression"""
 
     condition: "Expression"
 
 
-@dataclass
+@dataclass(**_NODE_OPTIONS)
 class Expression(ASTNode):
     """Base class for all expressions"""
 
     pass
 
 
-@dataclass
+@dataclass(**_NODE_OPTIONS)
 class BinaryOp(Expression):
     """Binary operation with left operand, operator, and right operand"""
 
@@ -46,7 +50,7 @@ class BinaryOp(Expression):
     right: Expression
 
 
-@dataclass
+@dataclass(**_NODE_OPTIONS)
 class UnaryOp(Expression):
     """Unary operation with operator and operand"""
 
@@ -54,7 +58,7 @@ class UnaryOp(Expression):
     operand: Expression
 
 
-@dataclass
+@dataclass(**_NODE_OPTIONS)
 class FieldAccess(Expression):
     """Field access expression (e.g., subject, metadata.RepetitionTime)"""
 
@@ -62,14 +66,14 @@ class FieldAccess(Expression):
     path: Optional[List[str]] = None
 
 
-@dataclass
+@dataclass(**_NODE_OPTIONS)
 class Literal(Expression):
     """Literal value expression"""
 
     value: Any
 
 
-@dataclass
+@dataclass(**_NODE_OPTIONS)
 class Range(Expression):
     """Range expression for [start:end] syntax"""
 
@@ -77,14 +81,14 @@ class Range(Expression):
     end: Any
 
 
-@dataclass
+@dataclass(**_NODE_OPTIONS)
 class ListExpression(Expression):
     """List expression for IN clauses"""
 
     items: List[Expression]
 
 
-@dataclass
+@dataclass(**_NODE_OPTIONS)
 class FunctionCall(Expression):
     """Function call expression (e.g., COUNT(*))"""
 
@@ -92,7 +96,7 @@ class FunctionCall(Expression):
     args: List[Expression]
 
 
-@dataclass
+@dataclass(**_NODE_OPTIONS)
 class ConditionalAggregateFunction(Expression):
     """Conditional aggregate function (e.g., ARRAY_AGG(field WHERE condition))"""
 
@@ -101,7 +105,7 @@ class ConditionalAggregateFunction(Expression):
     condition: Optional[Expression] = None
 
 
-@dataclass
+@dataclass(**_NODE_OPTIONS)
 class ParenthesizedExpression(Expression):
     """Parenthesized expression for implicit aggregation (e.g., (DISTINCT field), (field WHERE condition))"""
 
@@ -110,7 +114,7 @@ class ParenthesizedExpression(Expression):
     condition: Optional[Expression] = None
 
 
-@dataclass
+@dataclass(**_NODE_OPTIONS)
 class Query(ASTNode):
     """Complete BIQL query with all clauses"""
 
@@ -199,8 +199,7 @@ def interactive_shell(dataset: BIDSDataset, debug: bool = False) -> None:
 
             # Execute query
             try:
-                parser = BIQLParser.from_string(query_str)
-                query = parser.parse()
+                query = BIQLParser.parse_cached(query_str)
 
                 if debug:
                     print(f"Parsed: {query}")
@@ -374,17 +373,18 @@ def main() -> int:
                 if format_type == "paths"
                 else None
             )
-            formatted = BIQLFormatter.format(results, format_type, original_files)
-
             if args.output:
-                # Write to file
+                # Format fully before opening the file, so a formatting error
+                # does not leave a truncated file behind
+                formatted = BIQLFormatter.format(results, format_type, original_files)
                 with open(args.output, "w") as f:
                     f.write(formatted)
                 if args.debug:
                     print(f"Output written to: {args.output}", file=sys.stderr)
             else:
                 # Write to stdout
-                print(formatted)
+                BIQLFormatter.write(results, sys.stdout, format_type, original_files)
+                sys.stdout.write("\n")
 
         except Exception as e:
             print(f"Output formatting error: {e}", file=sys.stderr)
@@ -6,21 +6,110 @@ Handles loading and indexing BIDS datasets for querying.
 
 import json
 import os
+import sys
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Any, Dict, List, Set
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Directory names recognised as BIDS datatypes
+_DATATYPES = frozenset(
+    {
+        "anat",
+        "func",
+        "dwi",
+        "fmap",
+        "perf",
+        "meg",
+        "eeg",
+        "ieeg",
+        "beh",
+        "pet",
+        "micr",
+        "nirs",
+        "motion",
+        "mrs",
+    }
+)
+
+
+def _loads_json(content: bytes) -> Any:
+    """Parse JSON bytes, using orjson when it is installed"""
+    if orjson is not None:
+        try:
+            return orjson.loads(content)
+        except orjson.JSONDecodeError:
+            # orjson is stricter than json (e.g. NaN literals), so fall back
+            pass
+    return json.loads(content)
+
+
+def _copy_json(value: Any) -> Any:
+    """Copy parsed JSON so each file owns its nested lists and dicts
+
+    Sidecars are parsed once and shared between the files they apply to.
+    """
+    if isinstance(value, dict):
+        return {key: _copy_json(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_copy_json(item) for item in value]
+    return value
+
+
+class SidecarCache:
+    """Memoizes JSON sidecar reads and directory listings during indexing
+
+    Sidecars higher up the hierarchy apply to many files, so sharing one
+    cache across a dataset reads and lists each of them only once.
+    """
+
+    def __init__(self):
+        self._json: Dict[Path, Dict[str, Any]] = {}
+        self._json_files: Dict[Path, List[Path]] = {}
+        self._json_file_sets: Dict[Path, Set[Path]] = {}
+
+    def load_json(self, json_path: Path) -> Dict[str, Any]:
+        """Load a JSON file, reusing the parsed content on later calls"""
+        if json_path not in self._json:
+            with open(json_path, "rb") as f:
+                self._json[json_path] = _loads_json(f.read())
+        return self._json[json_path]
+
+    def json_files(self, directory: Path) -> List[Path]:
+        """List the JSON files in a directory, reusing the listing on later calls"""
+        if directory not in self._json_files:
+            self._json_files[directory] = list(directory.glob("*.json"))
+        return self._json_files[directory]
+
+    def has_json(self, json_path: Path) -> bool:
+        """Check whether a JSON file exists, using the cached directory listing"""
+        directory = json_path.parent
+        if directory not in self._json_file_sets:
+            self._json_file_sets[directory] = set(self.json_files(directory))
+        return json_path in self._json_file_sets[directory]
 
 
 @dataclass
 class BIDSFile:
     """Represents a BIDS file with entities and metadata"""
 
-    def __init__(self, filepath: Path, dataset_root: Path):
+    __slots__ = ("filepath", "dataset_root", "relative_path", "entities", "metadata")
+
+    def __init__(
+        self,
+        filepath: Path,
+        dataset_root: Path,
+        sidecar_cache: Optional[SidecarCache] = None,
+    ):
         self.filepath = filepath
         self.dataset_root = dataset_root
         self.relative_path = filepath.relative_to(dataset_root)
         self.entities = self._parse_entities()
-        self.metadata = self._load_metadata()
+        self.metadata = self._load_metadata(sidecar_cache or SidecarCache())
 
     def _parse_entities(self) -> Dict[str, str]:
         """Parse BIDS entities from filename and path"""
@@ -36,34 +125,20 @@ class BIDSFile:
         for part in parts:
             if "-" in part:
                 key, value = part.split("-", 1)
-                entities[key] = value
+                # Entity keys recur in every file, so share one string object
+                entities[sys.intern(key)] = value
             else:
                 # This is the suffix
-                entities["suffix"] = part
+                entities["suffix"] = sys.intern(part)
 
         # Add datatype from parent directory
         parent = self.filepath.parent.name
-        if parent in [
-            "anat",
-            "func",
-            "dwi",
-            "fmap",
-            "perf",
-            "meg",
-            "eeg",
-            "ieeg",
-            "beh",
-            "pet",
-            "micr",
-            "nirs",
-            "motion",
-            "mrs",
-        ]:
-            entities["datatype"] = parent
+        if parent in _DATATYPES:
+            entities["datatype"] = sys.intern(parent)
 
         # Add extension
         if len(name_parts) > 1:
-            entities["extension"] = "." + ".".join(name_parts[1:])
+            entities["extension"] = sys.intern("." + ".".join(name_parts[1:]))
 
         # Extract subject and session from path if not in filename
         path_parts = str(self.relative_path).split(os.sep)
@@ -75,7 +150,7 @@ class BIDSFile:
 
         return entities
 
-    def _load_metadata(self) -> Dict[str, Any]:
+    def _load_metadata(self, sidecar_cache: SidecarCache) -> Dict[str, Any]:
         """Load JSON sidecar metadata with inheritance"""
         metadata = {}
 
@@ -84,9 +159,9 @@ class BIDSFile:
 
         # Check for direct JSON sidecar
         json_path = current_path.parent / (current_path.stem + ".json")
-        if json_path.exists():
-            with open(json_path, "r") as f:
-                metadata.update(json.load(f))
+        if sidecar_cache.has_json(json_path):
+            for key, value in sidecar_cache.load_json(json_path).items():
+                metadata[key] = _copy_json(value)
 
         # Apply inheritance principle - check parent directories
         current_dir = self.filepath.parent
@@ -94,14 +169,13 @@ class BIDSFile:
 
         while current_dir != self.dataset_root and current_dir != current_dir.parent:
             # Look for applicable JSON files in current directory
-            for json_file in current_dir.glob("*.json"):
+            for json_file in sidecar_cache.json_files(current_dir):
                 if self._is_applicable_metadata(json_file, file_entities):
-                    with open(json_file, "r") as f:
-                        parent_metadata = json.load(f)
-                        # Parent metadata doesn't override existing
-                        for key, value in parent_metadata.items():
-                            if key not in metadata:
-                                metadata[key] = value
+                    parent_metadata = sidecar_cache.load_json(json_file)
+                    # Parent metadata doesn't override existing
+                    for key, value in parent_metadata.items():
+                        if key not in metadata:
+                            metadata[key] = _copy_json(value)
 
             current_dir = current_dir.parent
 
@@ -138,10 +212,13 @@ class BIDSDataset:
 
     def __init__(self, root_path: Path):
         self.root = Path(root_path).resolve()
-        if not self.root.exists():
+        if not self.root.is_dir():
+            if self.root.exists():
+                raise ValueError(f"Dataset path is not a directory: {self.root}")
             raise ValueError(f"Dataset path does not exist: {self.root}")
 
         self.files = self._index_files()
+        self._entity_index = self._build_entity_index()
         self.participants = self._load_participants()
         self.dataset_description = self._load_dataset_description()
 
@@ -149,26 +226,36 @@ class BIDSDataset:
         """Index all BIDS files in the dataset"""
         files = []
 
-        # Common BIDS file patterns
-        patterns = [
-            "**/*.nii.gz",
-            "**/*.nii",
-            "**/*.tsv",
-            "**/*.json",
-            "**/*.edf",
-            "**/*.vhdr",
-            "**/*.set",
-            "**/*.fif",
-            "**/*.mat",
-            "**/*.txt",
-            "**/*.bvec",
-            "**/*.bval",
+        # Common BIDS file extensions
+        extensions = [
+            ".nii.gz",
+            ".nii",
+            ".tsv",
+            ".json",
+            ".edf",
+            ".vhdr",
+            ".set",
+            ".fif",
+            ".mat",
+            ".txt",
+            ".bvec",
+            ".bval",
         ]
 
+        # Walk the tree once, bucketing candidates by extension so files are
+        # still visited extension by extension
+        candidates = [[] for _ in extensions]
+        for filepath in self._walk(str(self.root)):
+            for i, extension in enumerate(extensions):
+                if filepath.name.endswith(extension):
+                    candidates[i].append(filepath)
+                    break
+
         indexed_files = set()
+        sidecar_cache = SidecarCache()
 
-        for pattern in patterns:
-            for filepath in self.root.glob(pattern):
+        for bucket in candidates:
+            for filepath in bucket:
                 # Skip if already indexed
                 if filepath in indexed_files:
                     continue
@@ -198,7 +285,7 @@ class BIDSDataset:
                     continue
 
                 try:
-                    bids_file = BIDSFile(filepath, self.root)
+                    bids_file = BIDSFile(filepath, self.root, sidecar_cache)
                     # Only include files that look like BIDS files
                     if self._is_bids_file(bids_file):
                         files.append(bids_file)
@@ -209,6 +296,59 @@ class BIDSDataset:
 
         return files
 
+    def _walk(self, directory: str) -> Iterator[Path]:
+        """Yield every entry below directory using a single scandir per folder
+
+        Entries of a directory are yielded before descending into its
+        subdirectories. Symlinked directories are not followed.
+        """
+        try:
+            with os.scandir(directory) as it:
+                entries = list(it)
+        except PermissionError:
+            return
+
+        subdirs = []
+        for entry in entries:
+            yield Path(entry.path)
+            try:
+                if entry.is_dir() and not entry.is_symlink():
+                    subdirs.append(entry.path)
+            except OSError:
+                pass
+
+        for subdir in subdirs:
+            yield from self._walk(subdir)
+
+    def _build_entity_index(self) -> Dict[str, Dict[str, List[BIDSFile]]]:
+        """Index files by entity name and value for fast equality lookups"""
+        index: Dict[str, Dict[str, List[BIDSFile]]] = {}
+        for file in self.files:
+            for key, value in file.entities.items():
+                index.setdefault(key, {}).setdefault(value, []).append(file)
+        return index
+
+    def by_entity(self, entity: str, value: str) -> List[BIDSFile]:
+        """Get all files whose entity has the given value"""
+        return list(self._entity_index.get(entity, {}).get(value, []))
+
+    def by_entity_matching(
+        self, entity: str, predicate: Callable[[str], bool]
+    ) -> List[BIDSFile]:
+        """Get all files whose entity value satisfies predicate, in file order
+
+        The predicate is called once per distinct value rather than per file.
+        """
+        buckets = [
+            files
+            for value, files in self._entity_index.get(entity, {}).items()
+            if predicate(value)
+        ]
+        if len(buckets) <= 1:
+            return list(buckets[0]) if buckets else []
+        matched = {id(f) for files in buckets for f in files}
+        return [f for f in self.files if id(f) in matched]
+
     def _is_bids_file(self, bids_file: BIDSFile) -> bool:
         """Check if file appears to be a valid BIDS file"""
         # Must have at least a subject or be in a datatype directory
@@ -270,39 +410,20 @@ class BIDSDataset:
 
     def get_subjects(self) -> Set[str]:
         """Get all unique subjects in dataset"""
-        subjects = set()
-        for file in self.files:
-            if "sub" in file.entities:
-                subjects.add(file.entities["sub"])
-        return subjects
+        return set(self._entity_index.get("sub", {}))
 
     def get_sessions(self) -> Set[str]:
         """Get all unique sessions in dataset"""
-        sessions = set()
-        for file in self.files:
-            if "ses" in file.entities:
-                sessions.add(file.entities["ses"])
-        return sessions
+        return set(self._entity_index.get("ses", {}))
 
     def get_datatypes(self) -> Set[str]:
         """Get all unique datatypes in dataset"""
-        datatypes = set()
-        for file in self.files:
-            if "datatype" in file.entities:
-                datatypes.add(file.entities["datatype"])
-        return datatypes
+        return set(self._entity_index.get("datatype", {}))
 
     def get_tasks(self) -> Set[str]:
         """Get all unique tasks in dataset"""
-        tasks = set()
-        for file in self.files:
-            if "task" in file.entities:
-                tasks.add(file.entities["task"])
-        return tasks
+        return set(self._entity_index.get("task", {}))
 
     def get_entities(self) -> Set[str]:
         """Get all unique entity keys in dataset"""
-        entities = set()
-        for file in self.files:
-            entities.update(file.entities.keys())
-        return entities
+        return set(self._entity_index)
@@ -5,13 +5,26 @@ Evaluates parsed BIQL queries against BIDS datasets.
 """
 
 import fnmatch
+import functools
+import itertools
+import os
 import re
 from collections import defaultdict
-from typing import Any, Dict, List
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 from .ast_nodes import *
 from .dataset import BIDSDataset, BIDSFile
 from .lexer import TokenType
+from .parser import BIQLParser
+
+# Query strings whose compiled WHERE predicate each evaluator keeps
+_PREDICATE_CACHE_SIZE = 256
+
+
+@functools.lru_cache(maxsize=256)
+def _wildcard_regex(pattern: str) -> "re.Pattern[str]":
+    """Compile an fnmatch-style wildcard pattern, reusing it across queries"""
+    return re.compile(fnmatch.translate(pattern))
 
 
 class BIQLEvaluationError(Exception):
@@ -26,29 +39,86 @@ class BIQLEvaluator:
     def __init__(self, dataset: BIDSDataset):
         self.dataset = dataset
         self._original_matching_files = []
+        self._predicate_cache: Dict[str, Callable[[BIDSFile], bool]] = {}
 
     def evaluate(self, query: Query) -> List[Dict[str, Any]]:
         """Evaluate a query and return results"""
+        predicate = None
+        if query.where_clause:
+            predicate = self._compile_predicate(query.where_clause.condition)
+        return self._evaluate(query, predicate)
+
+    def evaluate_text(self, text: str) -> List[Dict[str, Any]]:
+        """Parse and evaluate a query string
+
+        The parsed query and its compiled WHERE predicate are reused when the
+        same string is evaluated again, so repeated queries skip straight to
+        matching files.
+        """
+        query = BIQLParser.parse_cached(text)
+        predicate = None
+        if query.where_clause:
+            predicate = self._predicate_cache.get(text)
+            if predicate is None:
+                if len(self._predicate_cache) >= _PREDICATE_CACHE_SIZE:
+                    # Evict the oldest entry; dicts keep insertion order
+                    del self._predicate_cache[next(iter(self._predicate_cache))]
+                predicate = self._compile_predicate(query.where_clause.condition)
+                self._predicate_cache[text] = predicate
+        return self._evaluate(query, predicate)
+
+    def _evaluate(
+        self, query: Query, predicate: Optional[Callable[[BIDSFile], bool]]
+    ) -> List[Dict[str, Any]]:
+        """Evaluate a query whose WHERE clause is already compiled"""
         # Start with all files
         results = self.dataset.files
 
         # Apply WHERE clause
-        if query.where_clause:
-            results = [
-                f
-                for f in results
-                if self._evaluate_expression(f, query.where_clause.condition)
-            ]
+        if predicate is not None:
+            condition = query.where_clause.condition
+            results = [f for f in self._candidate_files(condition) if predicate(f)]
 
         # Store the original matching files for paths formatter
         self._original_matching_files = results
 
+        if self._is_count_star_only(query):
+            # Only the number of matches is needed, so skip building row dicts
+            if not results:
+                return []
+            return [
+                {
+                    alias or "count": len(results)
+                    for _, alias in query.select_clause.items
+                }
+            ]
+
+        select_fields = self._plain_select_fields(query)
+        if select_fields is not None:
+            # Nothing needs whole rows, so project each file as it is converted
+            get_value = self._get_nested_value
+            rows = []
+            for file in results:
+                file_dict = self._file_to_dict(file)
+                rows.append(
+                    {key: get_value(file_dict, field) for key, field in select_fields}
+                )
+            if query.select_clause.distinct:
+                rows = self._apply_distinct(rows)
+            return rows
+
         # Convert to dictionaries for further processing
         result_dicts = []
         for file in results:
             result_dict = self._file_to_dict(file)
             result_dicts.append(result_dict)
 
+        return self._process_results(query, result_dicts)
+
+    def _process_results(
+        self, query: Query, result_dicts: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """Apply grouping, HAVING, ORDER BY and SELECT to matching files"""
         # Apply GROUP BY or create implicit group for aggregate functions
         if query.group_by:
             result_dicts = self._apply_group_by(result_dicts, query.group_by)
@@ -111,61 +181,329 @@ class BIQLEvaluator:
 
         return result_dict
 
-    def _evaluate_expression(self, file: BIDSFile, expr: Expression) -> bool:
-        """Evaluate an expression against a file"""
+    def _candidate_files(self, expr: Expression) -> List[BIDSFile]:
+        """Narrow the files a WHERE condition can match using the entity index
+
+        The full condition is still evaluated on every candidate, so this only
+        needs to return a superset of the matches, in dataset order.
+        """
+        if not (
+            hasattr(self.dataset, "by_entity")
+            and hasattr(self.dataset, "by_entity_matching")
+        ):
+            # Datasets without an entity index are scanned in full
+            return self.dataset.files
+
         if isinstance(expr, BinaryOp):
             if expr.operator == TokenType.AND:
-                return self._evaluate_expression(
-                    file, expr.left
-                ) and self._evaluate_expression(file, expr.right)
-            elif expr.operator == TokenType.OR:
-                return self._evaluate_expression(
-                    file, expr.left
-                ) or self._evaluate_expression(file, expr.right)
+                left = self._candidate_files(expr.left)
+                right = self._candidate_files(expr.right)
+                if len(right) < len(left):
+                    left, right = right, left
+                if right is self.dataset.files:
+                    return left
+                # Both sides hit the index, so intersect the buckets. Files
+                # are compared by identity and the smaller side keeps order.
+                right_ids = {id(f) for f in right}
+                return [f for f in left if id(f) in right_ids]
+            elif expr.operator == TokenType.EQ:
+                value = self._indexable_equality_value(expr)
+                if value is not None:
+                    return self.dataset.by_entity(expr.left.field, value)
+            elif expr.operator == TokenType.MATCH:
+                pattern = self._indexable_match_pattern(expr)
+                if pattern is not None:
+                    # Run the regex once per distinct entity value
+                    matcher = self._compile_pattern(TokenType.MATCH, pattern)
+                    return self.dataset.by_entity_matching(expr.left.field, matcher)
+
+            if self._is_participants_comparison(expr):
+                # The comparison only depends on the file's subject, so test
+                # one file per subject and keep the files of matching subjects
+                predicate = self._compile_predicate(expr)
+                by_entity = self.dataset.by_entity
+                return self.dataset.by_entity_matching(
+                    "sub", lambda sub: predicate(by_entity("sub", sub)[0])
+                )
+
+        return self.dataset.files
+
+    def _is_participants_comparison(self, expr: BinaryOp) -> bool:
+        """Check if a comparison only depends on participants data
+
+        Files without participants data never satisfy such a comparison,
+        except under !=, which is therefore excluded.
+        """
+        left, right = expr.left, expr.right
+        if (
+            expr.operator in (TokenType.AND, TokenType.OR, TokenType.NEQ)
+            or not isinstance(left, FieldAccess)
+            or left.field != "participants"
+            or not left.path
+        ):
+            return False
+        if isinstance(right, Range):
+            return isinstance(right.start, Literal) and isinstance(right.end, Literal)
+        return (
+            isinstance(right, (Literal, ListExpression))
+            or isinstance(right, FieldAccess)
+            and right.path is None
+        )
+
+    def _indexable_equality_value(self, expr: BinaryOp) -> Optional[str]:
+        """Get the value of an `entity=value` comparison the index can answer
+
+        Returns None for comparisons that need _compare's wildcard matching,
+        numeric coercion or computed fields.
+        """
+        value = self._indexable_match_pattern(expr)
+        if value is None or "*" in value or "?" in value:
+            return None
+        return value
+
+    def _indexable_match_pattern(self, expr: BinaryOp) -> Optional[str]:
+        """Get the string compared against an entity, if the index can answer it
+
+        Returns None unless the left side is a plain entity and the right side
+        a string or bare identifier.
+        """
+        left = expr.left
+        if (
+            not isinstance(left, FieldAccess)
+            or left.path
+            or left.field in ("filename", "filepath", "relative_path")
+        ):
+            return None
+
+        right = expr.right
+        if isinstance(right, FieldAccess) and right.path is None:
+            return right.field
+        elif isinstance(right, Literal) and isinstance(right.value, str):
+            return right.value
+        return None
+
+    def _compile_predicate(self, expr: Expression) -> Callable[[BIDSFile], bool]:
+        """Compile an expression into a predicate over files
+
+        The AST is walked once per query instead of once per file, so node
+        dispatch is resolved up front and evaluating a file is a chain of
+        closure calls.
+        """
+        if isinstance(expr, BinaryOp):
+            if expr.operator in (TokenType.AND, TokenType.OR):
+                # Both short-circuit, so run the cheapest operands first
+                operands = sorted(
+                    self._flatten_operands(expr, expr.operator),
+                    key=self._estimate_cost,
+                )
+                predicates = [self._compile_predicate(op) for op in operands]
+                if len(predicates) == 2:
+                    first, second = predicates
+                    if expr.operator == TokenType.AND:
+                        return lambda file: first(file) and second(file)
+                    return lambda file: first(file) or second(file)
+                if expr.operator == TokenType.AND:
+                    return lambda file: all(p(file) for p in predicates)
+                return lambda file: any(p(file) for p in predicates)
             else:
                 # Comparison operators
-                left_val = self._get_value(file, expr.left)
+                get_left = self._compile_value(expr.left)
+                operator = expr.operator
+                compare = self._compare
                 # For comparison right side, handle FieldAccess as literal values
                 if isinstance(expr.right, FieldAccess) and expr.right.path is None:
                     # Bare identifier on right side should be treated as literal
-                    right_val = expr.right.field
+                    right_value = expr.right.field
+                elif isinstance(expr.right, Literal):
+                    right_value = expr.right.value
+                elif isinstance(expr.right, Range) and all(
+                    isinstance(bound, Literal)
+                    for bound in (expr.right.start, expr.right.end)
+                ):
+                    return self._compile_range(
+                        get_left, operator, expr.right.start.value, expr.right.end.value
+                    )
                 else:
-                    right_val = self._get_value(file, expr.right)
-                return self._compare(left_val, expr.operator, right_val)
+                    get_right = self._compile_value(expr.right)
+                    return lambda file: compare(
+                        get_left(file), operator, get_right(file)
+                    )
+
+                matcher = None
+                if isinstance(right_value, str):
+                    matcher = self._compile_pattern(operator, right_value)
+                if matcher is None:
+                    return lambda file: compare(get_left(file), operator, right_value)
+
+                def match(file: BIDSFile) -> bool:
+                    value = get_left(file)
+                    return value is not None and matcher(str(value))
+
+                return match
 
         elif isinstance(expr, UnaryOp):
             if expr.operator == TokenType.NOT:
-                return not self._evaluate_expression(file, expr.operand)
+                operand = self._compile_predicate(expr.operand)
+                return lambda file: not operand(file)
 
         elif isinstance(expr, FieldAccess):
             # Simple field existence check
-            return self._get_value(file, expr) is not None
+            get_value = self._compile_value(expr)
+            return lambda file: get_value(file) is not None
+
+        return lambda file: False
+
+    def _compile_range(
+        self,
+        get_value: Callable[[BIDSFile], Any],
+        operator: TokenType,
+        start: Any,
+        end: Any,
+    ) -> Callable[[BIDSFile], bool]:
+        """Compile a comparison against a range with literal bounds
+
+        Matches _compare, but the bounds are converted to numbers once per
+        query rather than once per file.
+        """
+        try:
+            start = float(start) if isinstance(start, str) else start
+            end = float(end) if isinstance(end, str) else end
+        except ValueError:
+            # _compare would fail the same way for every non-null value
+            return lambda file: get_value(file) is None and operator == TokenType.NEQ
+
+        def in_range(file: BIDSFile) -> bool:
+            value = get_value(file)
+            if value is None:
+                return operator == TokenType.NEQ
+            try:
+                number = float(value) if isinstance(value, str) else value
+                return start <= number <= end
+            except (ValueError, TypeError):
+                return False
 
-        return False
+        return in_range
 
-    def _get_value(self, file: BIDSFile, expr: Expression) -> Any:
-        """Get value from file based on expression"""
+    def _flatten_operands(
+        self, expr: Expression, operator: TokenType
+    ) -> List[Expression]:
+        """Collect the operands of a chain of the same AND/OR operator"""
+        if isinstance(expr, BinaryOp) and expr.operator == operator:
+            return self._flatten_operands(expr.left, operator) + self._flatten_operands(
+                expr.right, operator
+            )
+        return [expr]
+
+    def _estimate_cost(self, expr: Expression) -> int:
+        """Rank how expensive an expression is to evaluate per file
+
+        Entity equality is cheapest, then other entity comparisons, wildcard
+        and LIKE patterns, metadata/participants lookups and regex matches.
+        """
+        if isinstance(expr, BinaryOp):
+            if expr.operator in (TokenType.AND, TokenType.OR):
+                return max(
+                    self._estimate_cost(expr.left), self._estimate_cost(expr.right)
+                )
+            if expr.operator == TokenType.MATCH:
+                return 4
+            if isinstance(expr.left, FieldAccess) and expr.left.path:
+                return 3
+            if expr.operator == TokenType.LIKE:
+                return 2
+            if expr.operator == TokenType.EQ:
+                right = expr.right
+                if isinstance(right, FieldAccess) and right.path is None:
+                    value = right.field
+                else:
+                    value = getattr(right, "value", None)
+                if isinstance(value, str) and ("*" in value or "?" in value):
+                    return 2
+                return 0
+            return 1
+        elif isinstance(expr, UnaryOp):
+            return self._estimate_cost(expr.operand)
+        elif isinstance(expr, FieldAccess):
+            return 3 if expr.path else 0
+        return 0
+
+    def _compile_pattern(
+        self, operator: TokenType, pattern: str
+    ) -> Optional[Callable[[str], bool]]:
+        """Precompile the pattern of a wildcard, LIKE or regex comparison
+
+        Returns a matcher over the string form of the left value, or None when
+        the comparison is not a pattern match. Mirrors _compare.
+        """
+        if operator == TokenType.EQ and ("*" in pattern or "?" in pattern):
+            return self._compile_wildcard(pattern)
+        elif operator == TokenType.LIKE:
+            # Convert SQL LIKE pattern to fnmatch pattern
+            return self._compile_wildcard(pattern.replace("%", "*").replace("_", "?"))
+        elif operator == TokenType.MATCH:
+            # Remove regex delimiters if present
+            if pattern.startswith("/") and pattern.endswith("/"):
+                pattern = pattern[1:-1]
+            try:
+                regex = re.compile(pattern)
+            except re.error:
+                return lambda value: False
+            return lambda value: regex.match(value) is not None
+        return None
+
+    def _compile_wildcard(self, pattern: str) -> Callable[[str], bool]:
+        """Precompile an fnmatch-style wildcard pattern"""
+        normcase = os.path.normcase
+        pattern = normcase(pattern)
+
+        def is_literal(text: str) -> bool:
+            return not any(c in text for c in "*?[")
+
+        # Literal text with at most a leading and/or trailing "*" reduces to
+        # plain string operations, which are cheaper than a regex
+        head, tail, inner = pattern[:-1], pattern[1:], pattern[1:-1]
+        if is_literal(pattern):
+            return lambda value: normcase(value) == pattern
+        elif pattern.endswith("*") and is_literal(head):
+            return lambda value: normcase(value).startswith(head)
+        elif pattern.startswith("*") and is_literal(tail):
+            return lambda value: normcase(value).endswith(tail)
+        elif (
+            len(pattern) >= 2 and pattern[0] == pattern[-1] == "*" and is_literal(inner)
+        ):
+            return lambda value: inner in normcase(value)
+
+        regex = _wildcard_regex(pattern)
+        return lambda value: regex.match(normcase(value)) is not None
+
+    def _compile_value(self, expr: Expression) -> Callable[[BIDSFile], Any]:
+        """Compile an expression into a function getting its value from a file"""
         if isinstance(expr, FieldAccess):
-            if expr.path:
+            path = expr.path
+            if path:
                 # Metadata or participants access
-                if expr.field == "metadata" and expr.path:
-                    value = file.metadata
-                    for part in expr.path:
-                        if isinstance(value, dict) and part in value:
-                            value = value[part]
-                        else:
+                if expr.field == "metadata":
+
+                    def get_metadata(file: BIDSFile) -> Any:
+                        value = file.metadata
+                        for part in path:
+                            if isinstance(value, dict) and part in value:
+                                value = value[part]
+                            else:
+                                return None
+                        return value
+
+                    return get_metadata
+                elif expr.field == "participants":
+                    participants = self.dataset.participants
+
+                    def get_participant(file: BIDSFile) -> Any:
+                        sub = file.entities.get("sub")
+                        if sub is None or sub not in participants:
                             return None
-                    return value
-                elif expr.field == "participants" and expr.path:
-                    if (
-                        "sub" in file.entities
-                        and file.entities["sub"] in self.dataset.participants
-                    ):
-                        value = self.dataset.participants[file.entities["sub"]]
-                        for part in expr.path:
+                        value = participants[sub]
+                        for part in path:
                             if isinstance(value, dict):
-                                # Debug: print what we're looking for vs what's available
-                                # print(f"DEBUG: Looking for '{part}' in {list(value.keys())}")
                                 # Try exact case first, then lowercase for keywords that got uppercased
                                 if part in value:
                                     value = value[part]
@@ -176,32 +514,36 @@ class BIQLEvaluator:
                             else:
                                 return None
                         return value
-                    return None
+
+                    return get_participant
             else:
                 # Handle computed fields first
-                if expr.field == "filename":
-                    return file.filepath.name
-                elif expr.field == "filepath":
-                    return str(file.filepath)
-                elif expr.field == "relative_path":
-                    return str(file.relative_path)
+                field = expr.field
+                if field == "filename":
+                    return lambda file: file.filepath.name
+                elif field == "filepath":
+                    return lambda file: str(file.filepath)
+                elif field == "relative_path":
+                    return lambda file: str(file.relative_path)
                 else:
                     # Entity access - return the value from file entities
-                    return file.entities.get(expr.field)
+                    return lambda file: file.entities.get(field)
 
         elif isinstance(expr, Literal):
-            return expr.value
+            value = expr.value
+            return lambda file: value
 
         elif isinstance(expr, Range):
             # Extract the actual values from the Range expressions
-            start_val = self._get_value(file, expr.start)
-            end_val = self._get_value(file, expr.end)
-            return (start_val, end_val)
+            get_start = self._compile_value(expr.start)
+            get_end = self._compile_value(expr.end)
+            return lambda file: (get_start(file), get_end(file))
 
         elif isinstance(expr, ListExpression):
-            return [self._get_literal_value(item) for item in expr.items]
+            items = [self._get_literal_value(item) for item in expr.items]
+            return lambda file: items
 
-        return None
+        return lambda file: None
 
     def _get_literal_value(self, expr: Expression) -> Any:
         """Get literal value from expression"""
@@ -338,9 +680,16 @@ class BIQLEvaluator:
         """Apply GROUP BY to results"""
         grouped = defaultdict(list)
 
-        for result in results:
-            key = tuple(self._get_nested_value(result, field) for field in group_fields)
-            grouped[key].append(result)
+        # Files come in directory-walk order, so rows sharing a group key tend
+        # to be adjacent; hash each run of equal keys once rather than each row
+        runs = itertools.groupby(
+            results,
+            key=lambda result: tuple(
+                self._get_nested_value(result, field) for field in group_fields
+            ),
+        )
+        for key, run in runs:
+            grouped[key].extend(run)
 
         # Create aggregated results
         aggregated = []
@@ -401,6 +750,38 @@ class BIQLEvaluator:
 
         return dict(aggregates)
 
+    def _is_count_star_only(self, query: Query) -> bool:
+        """Check if a query selects nothing but COUNT(*) over one implicit group"""
+        return (
+            query.select_clause is not None
+            and not query.group_by
+            and not query.having
+            and all(item == "COUNT(*)" for item, _ in query.select_clause.items)
+        )
+
+    def _plain_select_fields(self, query: Query) -> Optional[List[Tuple[str, str]]]:
+        """Get (key, field) pairs for a SELECT that only projects fields
+
+        Returns None when rows must stay whole for grouping, HAVING or
+        ORDER BY, or when SELECT has * or aggregates. Mirrors _apply_select.
+        """
+        if (
+            query.select_clause is None
+            or query.group_by
+            or query.having
+            or query.order_by
+        ):
+            return None
+
+        fields = []
+        for item, alias in query.select_clause.items:
+            if item == "*" or item.startswith(
+                ("COUNT(", "ARRAY_AGG(", "AVG(", "MAX(", "MIN(", "SUM(", "(")
+            ):
+                return None
+            fields.append((alias if alias else item, item))
+        return fields
+
     def _has_aggregate_functions(self, select_clause) -> bool:
         """Check if SELECT clause contains aggregate functions"""
         if not select_clause:
@@ -414,12 +795,8 @@ class BIQLEvaluator:
     def _evaluate_array_agg_condition(self, item: Dict, condition_str: str) -> bool:
         """Evaluate a condition for ARRAY_AGG WHERE clause"""
         try:
-            # Import here to avoid circular imports
-            from .parser import BIQLParser
-
-            # Parse the condition string as an expression
-            parser = BIQLParser.from_string(f"WHERE {condition_str}")
-            query = parser.parse()
+            # Parse the condition string as an expression (once per condition)
+            query = BIQLParser.parse_cached(f"WHERE {condition_str}")
 
             if query.where_clause:
                 # Evaluate the expression against the item dictionary
@@ -536,6 +913,21 @@ class BIQLEvaluator:
 
         return None
 
+    def _count_distinct(self, group: List[Dict], field: str) -> int:
+        """Count the distinct non-null values of a field in a group
+
+        Values are compared as strings for consistency, accumulating straight
+        into a set in one pass.
+        """
+        get_value = self._get_nested_value
+        return len(
+            {
+                str(value)
+                for row in group
+                if (value := get_value(row, field)) is not None
+            }
+        )
+
     def _evaluate_having(self, grouped_result: Dict, having_expr: Expression) -> bool:
         """Evaluate HAVING clause on grouped results"""
         if isinstance(having_expr, BinaryOp):
@@ -557,13 +949,9 @@ class BIQLEvaluator:
                     ]  # Remove "DISTINCT "
 
                     # Count distinct values in the group
-                    group = grouped_result.get("_group", [])
-                    values = set()
-                    for row in group:
-                        value = self._get_nested_value(row, field_name)
-                        if value is not None:
-                            values.add(str(value))
-                    count = len(values)
+                    count = self._count_distinct(
+                        grouped_result.get("_group", []), field_name
+                    )
                 else:
                     # Regular COUNT(*)
                     count = grouped_result.get("_count", 0)
@@ -655,15 +1043,9 @@ class BIQLEvaluator:
 
                         if "_group" in result:
                             # For grouped results, count distinct values of the field
-                            group = result["_group"]
-                            values = set()
-                            for row in group:
-                                value = self._get_nested_value(row, field_part)
-                                if value is not None:
-                                    values.add(
-                                        str(value)
-                                    )  # Convert to string for consistency
-                            selected[key] = len(values)
+                            selected[key] = self._count_distinct(
+                                result["_group"], field_part
+                            )
                         else:
                             # For single row, distinct count is either 0 or 1
                             value = self._get_nested_value(result, field_part)
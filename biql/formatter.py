@@ -9,7 +9,7 @@ import io
 import json
 import os
 import shutil
-from typing import Any, Dict, List, Optional
+from typing import IO, Any, Dict, List, Optional
 
 from tabulate import tabulate
 
@@ -41,17 +41,54 @@ class BIQLFormatter:
             return BIQLFormatter._format_json(results)
 
     @staticmethod
-    def _format_json(results: List[Dict]) -> str:
-        """Format results as JSON"""
+    def write(
+        results: List[Dict],
+        out: IO[str],
+        format_type: str = "json",
+        original_files: Optional[List] = None,
+    ) -> None:
+        """Write formatted results to a text stream
+
+        JSON, CSV and TSV output is written incrementally instead of being
+        built up as one string first. Other formats are written whole.
+        """
+        format_type = format_type.lower() if format_type else "json"
+
+        if format_type == "csv":
+            BIQLFormatter._write_csv(results, out)
+        elif format_type == "tsv":
+            BIQLFormatter._write_tsv(results, out)
+        elif format_type in ("table", "paths"):
+            out.write(BIQLFormatter.format(results, format_type, original_files))
+        else:
+            BIQLFormatter._write_json(results, out)
 
-        def json_serializer(obj):
-            """Custom JSON serializer for complex objects"""
-            if hasattr(obj, "__dict__"):
-                return obj.__dict__
-            return str(obj)
+    @staticmethod
+    def _json_serializer(obj: Any) -> Any:
+        """Custom JSON serializer for complex objects"""
+        if hasattr(obj, "__dict__"):
+            return obj.__dict__
+        return str(obj)
 
+    @staticmethod
+    def _format_json(results: List[Dict]) -> str:
+        """Format results as JSON"""
         return json.dumps(
-            results, indent=2, default=json_serializer, ensure_ascii=False
+            results,
+            indent=2,
+            default=BIQLFormatter._json_serializer,
+            ensure_ascii=False,
+        )
+
+    @staticmethod
+    def _write_json(results: List[Dict], out: IO[str]) -> None:
+        """Write results as JSON to a text stream"""
+        json.dump(
+            results,
+            out,
+            indent=2,
+            default=BIQLFormatter._json_serializer,
+            ensure_ascii=False,
         )
 
     @staticmethod
@@ -80,15 +117,17 @@ class BIQLFormatter:
         except (AttributeError, OSError):
             console_width = 80  # Default fallback
 
-        # Calculate actual content widths for each column
-        col_widths = {}
-        for key in all_keys:
-            # Start with header width
-            col_widths[key] = len(key)
-            # Check content width
-            for result in results:
-                value = BIQLFormatter._format_value_for_display(result.get(key))
-                col_widths[key] = max(col_widths[key], len(str(value)))
+        # Format every cell once, measuring content widths as we go, and reuse
+        # the formatted rows when building the table
+        format_value = BIQLFormatter._format_value_for_display
+        col_widths = {key: len(key) for key in all_keys}
+        display_rows = []
+        for result in results:
+            row = [format_value(result.get(key)) for key in all_keys]
+            for key, value in zip(all_keys, row):
+                if len(value) > col_widths[key]:
+                    col_widths[key] = len(value)
+            display_rows.append(row)
 
         # Define sensible max widths for known columns (only used when space is limited)
         max_width_config = {
@@ -139,13 +178,11 @@ class BIQLFormatter:
                 maxcolwidths = [available_width - 5]
 
         # Prepare data for tabulate
-        table_data = []
-        for result in results:
-            row = []
-            for key in selected_keys:
-                value = BIQLFormatter._format_value_for_display(result.get(key))
-                row.append(value)
-            table_data.append(row)
+        if len(selected_keys) == len(all_keys):
+            table_data = display_rows
+        else:
+            positions = [all_keys.index(key) for key in selected_keys]
+            table_data = [[row[i] for i in positions] for row in display_rows]
 
         # Use tabulate with maxcolwidths for automatic text wrapping (only when needed)
         if maxcolwidths is not None:
@@ -180,10 +217,16 @@ class BIQLFormatter:
     @staticmethod
     def _format_csv(results: List[Dict]) -> str:
         """Format results as CSV"""
-        if not results:
-            return "No results found"
-
         output = io.StringIO()
+        BIQLFormatter._write_csv(results, output)
+        return output.getvalue()
+
+    @staticmethod
+    def _write_csv(results: List[Dict], out: IO[str]) -> None:
+        """Write results as CSV to a text stream"""
+        if not results:
+            out.write("No results found")
+            return
 
         # Get all fieldnames, preserving order from first result
         fieldnames = []
@@ -197,9 +240,7 @@ class BIQLFormatter:
                     seen_keys.add(key)
 
         if fieldnames:
-            writer = csv.DictWriter(
-                output, fieldnames=fieldnames, extrasaction="ignore"
-            )
+            writer = csv.DictWriter(out, fieldnames=fieldnames, extrasaction="ignore")
             writer.writeheader()
 
             for result in results:
@@ -210,13 +251,19 @@ class BIQLFormatter:
                     csv_row[key] = BIQLFormatter._format_value_for_csv(value)
                 writer.writerow(csv_row)
 
-        return output.getvalue()
-
     @staticmethod
     def _format_tsv(results: List[Dict]) -> str:
         """Format results as TSV (Tab-Separated Values)"""
+        output = io.StringIO()
+        BIQLFormatter._write_tsv(results, output)
+        return output.getvalue()
+
+    @staticmethod
+    def _write_tsv(results: List[Dict], out: IO[str]) -> None:
+        """Write results as TSV to a text stream"""
         if not results:
-            return "No results found"
+            out.write("No results found")
+            return
 
         # Get all fieldnames, preserving order from first result
         fieldnames = []
@@ -230,12 +277,10 @@ class BIQLFormatter:
                     seen_keys.add(key)
 
         if not fieldnames:
-            return ""
-
-        lines = []
+            return
 
         # Header
-        lines.append("\t".join(fieldnames))
+        out.write("\t".join(fieldnames))
 
         # Data rows
         for result in results:
@@ -244,9 +289,8 @@ class BIQLFormatter:
                 value = result.get(key)
                 formatted_value = BIQLFormatter._format_value_for_csv(value)
                 row_values.append(formatted_value)
-            lines.append("\t".join(row_values))
-
-        return "\n".join(lines)
+            out.write("\n")
+            out.write("\t".join(row_values))
 
     @staticmethod
     def _format_paths(
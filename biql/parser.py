@@ -4,6 +4,7 @@ Parser for BIDS Query Language (BIQL)
 Converts tokenized BIQL queries into Abstract Syntax Trees (AST).
 """
 
+import functools
 from typing import List
 
 from .ast_nodes import *
@@ -30,6 +31,14 @@ class BIQLParser:
         tokens = lexer.tokenize()
         return cls(tokens)
 
+    @staticmethod
+    def parse_cached(query: str) -> Query:
+        """Parse a query string, reusing the AST for strings seen before
+
+        The returned Query is shared between callers and must not be mutated.
+        """
+        return _parse_cached(query)
+
     def parse(self) -> Query:
         """Parse tokens into Query AST"""
         # Optional SELECT clause
@@ -541,3 +550,9 @@ class BIQLParser:
 
         else:
             return str(expr)
+
+
+@functools.lru_cache(maxsize=256)
+def _parse_cached(query: str) -> Query:
+    """Parse a query string once per distinct string"""
+    return BIQLParser.from_string(query).parse()
@@ -10,7 +10,6 @@ from typing import Any, Dict, List, Optional, Union
 from .dataset import BIDSDataset
 from .evaluator import BIQLEvaluator
 from .formatter import BIQLFormatter
-from .parser import BIQLParser
 
 
 class BIQLQuery:
@@ -50,10 +49,8 @@ class BIQLQuery:
             - str for 'table', 'csv', 'tsv', 'paths' formats
             - DataFrame for 'dataframe' format
         """
-        # Parse and evaluate query
-        parser = BIQLParser.from_string(query)
-        parsed_query = parser.parse()
-        results = self.evaluator.evaluate(parsed_query)
+        # Parse and evaluate query, reusing the compiled plan for repeats
+        results = self.evaluator.evaluate_text(query)
 
         # Determine output format
         output_format = format if format is not None else self.default_format
@@ -1,6 +1,6 @@
 #!/usr/bin/env python3
 
-from setuptools import find_packages, setup
+from setuptools import setup
 
 with open("README.md", "r", encoding="utf-8") as fh:
     long_description = fh.read()
@@ -18,7 +18,7 @@ setup(
         "Source": "https://github.com/astewartau/biql",
         "Documentation": "https://astewartau.github.io/biql/",
     },
-    packages=find_packages(),
+    packages=["biql"],
     classifiers=[
         "Development Status :: 3 - Alpha",
         "Intended Audience :: Science/Research",
@@ -42,6 +42,7 @@ setup(
         "dev": [
             "pytest>=6.0",
             "pytest-cov",
+            "pytest-xdist",
             "black",
             "isort",
             "flake8",
@@ -49,7 +50,9 @@ setup(
         "test": [
             "pytest>=6.0",
             "pytest-cov",
+            "pytest-xdist",
         ],
+        "fast": ["orjson"],
     },
     entry_points={
         "console_scripts": [
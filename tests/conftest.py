@@ -13,6 +13,9 @@ from pathlib import Path
 
 import pytest
 
+from biql.dataset import BIDSDataset
+from biql.evaluator import BIQLEvaluator
+
 
 class BIDSExamplesManager:
     """Manages BIDS examples repository for testing."""
@@ -179,10 +182,24 @@ def bids_examples_dir():
     _bids_examples_manager.cleanup()
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def synthetic_dataset_path(bids_examples_dir):
     """Fixture providing path to synthetic BIDS dataset."""
     synthetic_path = bids_examples_dir / "synthetic"
     if not synthetic_path.exists():
         pytest.fail("Synthetic dataset not available")
     return str(synthetic_path)
+
+
+@pytest.fixture(scope="session")
+def synthetic_dataset(synthetic_dataset_path):
+    """Session-scoped synthetic BIDS dataset, indexed once and shared read-only."""
+    dataset = BIDSDataset(synthetic_dataset_path)
+    assert dataset.files and dataset.participants, "synthetic dataset is empty"
+    return dataset
+
+
+@pytest.fixture(scope="session")
+def evaluator(synthetic_dataset):
+    """Session-scoped evaluator over the shared synthetic dataset."""
+    return BIQLEvaluator(synthetic_dataset)
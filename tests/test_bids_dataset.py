@@ -4,6 +4,8 @@ Comprehensive tests for BIDS Query Language (BIQL)
 Tests all components of the BIQL implementation using real BIDS examples.
 """
 
+import json
+
 import pytest
 
 from biql.dataset import BIDSDataset
@@ -12,16 +14,15 @@ from biql.dataset import BIDSDataset
 class TestBIDSDataset:
     """Test BIDS dataset loading and indexing"""
 
-    def test_dataset_loading(self, synthetic_dataset_path):
+    def test_dataset_loading(self, synthetic_dataset):
         """Test basic dataset loading"""
-        synthetic_dataset = BIDSDataset(synthetic_dataset_path)
-
-        assert len(synthetic_dataset.files) > 0
-        assert len(synthetic_dataset.participants) > 0
+        # Non-emptiness is checked once by the fixture
+        assert all(
+            synthetic_dataset.root in f.filepath.parents
+            for f in synthetic_dataset.files
+        )
 
-    def test_entity_extraction(self, synthetic_dataset_path):
-        """Test BIDS entity extraction"""
-        synthetic_dataset = BIDSDataset(synthetic_dataset_path)
+    def test_entity_extraction(self, synthetic_dataset):
         """Test BIDS entity extraction"""
         subjects = synthetic_dataset.get_subjects()
         assert "01" in subjects
@@ -31,35 +32,35 @@ class TestBIDSDataset:
         assert "anat" in datatypes
         assert "func" in datatypes
 
-    def test_file_parsing(self, synthetic_dataset_path):
-        """Test individual file parsing"""
-        synthetic_dataset = BIDSDataset(synthetic_dataset_path)
+    def test_file_parsing(self, synthetic_dataset):
         """Test individual file parsing"""
         # Find a functional file
-        func_files = [
-            f for f in synthetic_dataset.files if f.entities.get("datatype") == "func"
-        ]
+        func_files = synthetic_dataset.by_entity("datatype", "func")
         assert len(func_files) > 0
 
         func_file = func_files[0]
         assert "sub" in func_file.entities
         assert "task" in func_file.entities
 
-    def test_participants_loading(self, synthetic_dataset_path):
-        """Test participants.tsv loading"""
-        synthetic_dataset = BIDSDataset(synthetic_dataset_path)
+        # Index lookups agree with a full scan of the files (BIDSFile equality
+        # ignores its slots, so compare paths)
+        assert [f.filepath for f in func_files] == [
+            f.filepath
+            for f in synthetic_dataset.files
+            if f.entities.get("datatype") == "func"
+        ]
+        assert synthetic_dataset.by_entity("datatype", "nonexistent") == []
+
+    def test_participants_loading(self, synthetic_dataset):
         """Test participants.tsv loading"""
         participants = synthetic_dataset.participants
-        assert len(participants) > 0
 
         # Check specific participant data
         if "01" in participants:
             assert "age" in participants["01"]
             assert "sex" in participants["01"]
 
-    def test_metadata_inheritance(self, synthetic_dataset_path):
-        """Test JSON metadata inheritance"""
-        synthetic_dataset = BIDSDataset(synthetic_dataset_path)
+    def test_metadata_inheritance(self, synthetic_dataset):
         """Test JSON metadata inheritance"""
         # The synthetic dataset doesn't have individual file metadata,
         # but it should inherit from dataset-level task files
@@ -73,6 +74,60 @@ class TestBIDSDataset:
         for task_file in task_files[:3]:  # Check first few files
             assert "task" in task_file.entities
 
+    def test_inherited_metadata_is_not_shared(self, tmp_path):
+        """Test that files inheriting one sidecar get their own nested values"""
+        (tmp_path / "dataset_description.json").write_text(
+            json.dumps({"Name": "Sidecar", "BIDSVersion": "1.8.0"})
+        )
+        func_dir = tmp_path / "sub-01" / "func"
+        func_dir.mkdir(parents=True)
+        (tmp_path / "sub-01" / "sub-01_task-rest_bold.json").write_text(
+            json.dumps({"SliceTiming": [0.0, 0.5]})
+        )
+        for run in ["01", "02"]:
+            (func_dir / f"sub-01_task-rest_run-{run}_bold.nii.gz").touch()
+
+        first, second = BIDSDataset(tmp_path).by_entity("extension", ".nii.gz")
+        first.metadata["SliceTiming"].append(1.0)
+
+        assert second.metadata["SliceTiming"] == [0.0, 0.5]
+
+    def test_edited_sidecar_is_reread(self, tmp_path):
+        """Test that reloading a dataset picks up edits to a cached sidecar"""
+        (tmp_path / "dataset_description.json").write_text(
+            json.dumps({"Name": "Sidecar", "BIDSVersion": "1.8.0"})
+        )
+        anat_dir = tmp_path / "sub-01" / "anat"
+        anat_dir.mkdir(parents=True)
+        (anat_dir / "sub-01_T1w.nii.gz").touch()
+        sidecar = anat_dir / "sub-01_T1w.json"
+
+        sidecar.write_text(json.dumps({"RepetitionTime": 2}))
+        first = BIDSDataset(tmp_path).by_entity("suffix", "T1w")[0]
+        assert first.metadata["RepetitionTime"] == 2
+
+        sidecar.write_text(json.dumps({"RepetitionTime": 2.5}))
+        second = BIDSDataset(tmp_path).by_entity("suffix", "T1w")[0]
+        assert second.metadata["RepetitionTime"] == 2.5
+
+    def test_datasets_do_not_share_metadata(self, tmp_path):
+        """Test that mutating one dataset's metadata leaves a reload untouched"""
+        (tmp_path / "dataset_description.json").write_text(
+            json.dumps({"Name": "Sidecar", "BIDSVersion": "1.8.0"})
+        )
+        anat_dir = tmp_path / "sub-01" / "anat"
+        anat_dir.mkdir(parents=True)
+        (anat_dir / "sub-01_T1w.nii.gz").touch()
+        (anat_dir / "sub-01_T1w.json").write_text(
+            json.dumps({"SliceTiming": [0.0, 0.5]})
+        )
+
+        first = BIDSDataset(tmp_path).by_entity("suffix", "T1w")[0]
+        first.metadata["SliceTiming"].append(1.0)
+
+        second = BIDSDataset(tmp_path).by_entity("suffix", "T1w")[0]
+        assert second.metadata["SliceTiming"] == [0.0, 0.5]
+
 
 if __name__ == "__main__":
     # Run specific test categories
@@ -4,9 +4,10 @@ Comprehensive tests for BIDS Query Language (BIQL)
 Tests all components of the BIQL implementation using real BIDS examples.
 """
 
+import fnmatch
 import json
 import os
-import tempfile
+from collections import Counter
 from pathlib import Path
 
 import pytest
@@ -16,23 +17,58 @@ from biql.evaluator import BIQLEvaluator
 from biql.parser import BIQLParser
 
 
-class TestBIQLEvaluator:
-    """Test BIQL query evaluation"""
+@pytest.fixture(scope="module")
+def reserved_keyword_dataset(tmp_path_factory):
+    """Create a test dataset with reserved keywords in participants.tsv"""
+    tmpdir = tmp_path_factory.mktemp("biql_rk")
+
+    # Dataset description
+    (tmpdir / "dataset_description.json").write_text(
+        json.dumps({"Name": "ReservedKeywordTest", "BIDSVersion": "1.8.0"})
+    )
+
+    # Participants file with 'group' field (reserved keyword)
+    (tmpdir / "participants.tsv").write_text(
+        "participant_id\tage\tsex\tgroup\tsite\n"
+        "sub-01\t25\tF\tcontrol\tSiteA\n"
+        "sub-02\t28\tM\tpatient\tSiteA\n"
+        "sub-03\t22\tF\tcontrol\tSiteB\n"
+    )
+
+    # Create test files with specific naming for type coercion tests
+    files = [
+        ("sub-01/anat/sub-01_T1w.nii.gz", {}),
+        ("sub-01/func/sub-01_task-rest_bold.nii.gz", {"RepetitionTime": 2.0}),
+        ("sub-02/anat/sub-02_T1w.nii.gz", {}),
+        ("sub-02/func/sub-02_task-rest_bold.nii.gz", {"RepetitionTime": 2.0}),
+        ("sub-03/func/sub-03_task-rest_bold.nii.gz", {"RepetitionTime": 2.0}),
+    ]
+
+    for file_path, metadata in files:
+        full_path = tmpdir / file_path
+        full_path.parent.mkdir(parents=True, exist_ok=True)
+        full_path.touch()
 
-    @pytest.fixture
-    def synthetic_dataset(self, synthetic_dataset_path):
-        """Fixture for synthetic BIDS dataset"""
-        return BIDSDataset(synthetic_dataset_path)
+        # Create JSON metadata if provided
+        if metadata:
+            json_path = full_path.with_suffix(".json")
+            json_path.write_text(json.dumps(metadata))
 
-    @pytest.fixture
-    def evaluator(self, synthetic_dataset):
-        """Fixture for BIQL evaluator"""
-        return BIQLEvaluator(synthetic_dataset)
+    return BIDSDataset(tmpdir)
+
+
+@pytest.fixture(scope="module")
+def reserved_keyword_evaluator(reserved_keyword_dataset):
+    """Evaluator for reserved keyword dataset"""
+    return BIQLEvaluator(reserved_keyword_dataset)
+
+
+class TestBIQLEvaluator:
+    """Test BIQL query evaluation"""
 
     def test_simple_entity_query(self, evaluator):
         """Test simple entity-based queries"""
-        parser = BIQLParser.from_string("sub=01")
-        query = parser.parse()
+        query = BIQLParser.parse_cached("sub=01")
         results = evaluator.evaluate(query)
 
         assert len(results) > 0
@@ -41,8 +77,7 @@ class TestBIQLEvaluator:
 
     def test_datatype_filtering(self, evaluator):
         """Test datatype filtering"""
-        parser = BIQLParser.from_string("datatype=func")
-        query = parser.parse()
+        query = BIQLParser.parse_cached("datatype=func")
         results = evaluator.evaluate(query)
 
         assert len(results) > 0
@@ -51,8 +86,7 @@ class TestBIQLEvaluator:
 
     def test_task_filtering(self, evaluator):
         """Test task filtering"""
-        parser = BIQLParser.from_string("task=nback")
-        query = parser.parse()
+        query = BIQLParser.parse_cached("task=nback")
         results = evaluator.evaluate(query)
 
         assert len(results) > 0
@@ -61,16 +95,14 @@ class TestBIQLEvaluator:
 
     def test_logical_operators(self, evaluator):
         """Test logical AND/OR operators"""
-        parser = BIQLParser.from_string("sub=01 AND datatype=func")
-        query = parser.parse()
+        query = BIQLParser.parse_cached("sub=01 AND datatype=func")
         results = evaluator.evaluate(query)
 
         for result in results:
             assert result["sub"] == "01"
             assert result["datatype"] == "func"
 
-        parser = BIQLParser.from_string("task=nback OR task=rest")
-        query = parser.parse()
+        query = BIQLParser.parse_cached("task=nback OR task=rest")
         results = evaluator.evaluate(query)
 
         for result in results:
@@ -79,13 +111,11 @@ class TestBIQLEvaluator:
     def test_range_syntax_returns_empty_list(self, evaluator):
         """Test the exact issue reported: run=[1:2] returns [] while run IN [1,2] returns results"""
         # User's exact query that returns empty list
-        parser_range = BIQLParser.from_string("SELECT sub WHERE run=[1:2]")
-        query_range = parser_range.parse()
+        query_range = BIQLParser.parse_cached("SELECT sub WHERE run=[1:2]")
         results_range = evaluator.evaluate(query_range)
 
         # User's working query with IN syntax
-        parser_in = BIQLParser.from_string("SELECT sub WHERE run IN [1,2]")
-        query_in = parser_in.parse()
+        query_in = BIQLParser.parse_cached("SELECT sub WHERE run IN [1,2]")
         results_in = evaluator.evaluate(query_in)
 
         # IN syntax should return 20 results (5 subjects × 2 sessions × 2 runs)
@@ -111,17 +141,15 @@ class TestBIQLEvaluator:
         # (5 subjects × 2 sessions × 2 runs = 20 files)
 
         # Test with range syntax
-        parser_range = BIQLParser.from_string(
+        query_range = BIQLParser.parse_cached(
             "SELECT sub, task, run WHERE run=[1:2] AND datatype=func"
         )
-        query_range = parser_range.parse()
         results_range = evaluator.evaluate(query_range)
 
         # Test with IN syntax
-        parser_in = BIQLParser.from_string(
+        query_in = BIQLParser.parse_cached(
             "SELECT sub, task, run WHERE run IN [1,2] AND datatype=func"
         )
-        query_in = parser_in.parse()
         results_in = evaluator.evaluate(query_in)
 
         # We expect 20 results (all nback files with run-01 or run-02)
@@ -153,8 +181,7 @@ class TestBIQLEvaluator:
 
     def test_wildcard_matching(self, evaluator):
         """Test wildcard pattern matching"""
-        parser = BIQLParser.from_string("suffix=*bold*")
-        query = parser.parse()
+        query = BIQLParser.parse_cached("suffix=*bold*")
         results = evaluator.evaluate(query)
 
         for result in results:
@@ -163,8 +190,7 @@ class TestBIQLEvaluator:
 
     def test_metadata_queries(self, evaluator):
         """Test metadata queries"""
-        parser = BIQLParser.from_string("metadata.RepetitionTime>0")
-        query = parser.parse()
+        query = BIQLParser.parse_cached("metadata.RepetitionTime>0")
         results = evaluator.evaluate(query)
 
         # Should find files with RepetitionTime metadata
@@ -176,8 +202,7 @@ class TestBIQLEvaluator:
 
     def test_participants_queries(self, evaluator):
         """Test participants data queries"""
-        parser = BIQLParser.from_string("participants.age>20")
-        query = parser.parse()
+        query = BIQLParser.parse_cached("participants.age>20")
         results = evaluator.evaluate(query)
 
         for result in results:
@@ -187,22 +212,21 @@ class TestBIQLEvaluator:
 
     def test_select_clause(self, evaluator):
         """Test SELECT clause functionality"""
-        parser = BIQLParser.from_string(
+        query = BIQLParser.parse_cached(
             "SELECT sub, task, filepath WHERE datatype=func"
         )
-        query = parser.parse()
         results = evaluator.evaluate(query)
 
-        if results:
-            result = results[0]
-            expected_keys = {"sub", "task", "filepath"}
+        expected_keys = {"sub", "task", "filepath"}
+        for result in results:
             # Result may have more keys, but should have at least these
-            assert expected_keys.issubset(set(result.keys()))
+            assert expected_keys.issubset(
+                result.keys()
+            ), f"Missing {expected_keys - result.keys()} in {result}"
 
     def test_group_by_functionality(self, evaluator):
         """Test GROUP BY functionality"""
-        parser = BIQLParser.from_string("SELECT sub, COUNT(*) GROUP BY sub")
-        query = parser.parse()
+        query = BIQLParser.parse_cached("SELECT sub, COUNT(*) GROUP BY sub")
         results = evaluator.evaluate(query)
 
         assert len(results) > 0
@@ -418,7 +442,10 @@ class TestBIQLEvaluator:
         )
         query = parser.parse()
         results = evaluator.evaluate(query)
-        # Should parse and execute without error
+
+        for result in results:
+            for filename in result["func_files"]:
+                assert "_task-" in filename, f"not a func file: {filename}"
 
         # Test inequality condition
         parser = BIQLParser.from_string(
@@ -426,7 +453,10 @@ class TestBIQLEvaluator:
         )
         query = parser.parse()
         results = evaluator.evaluate(query)
-        # Should parse and execute without error
+
+        for result in results:
+            for filename in result["non_dwi_files"]:
+                assert "_dwi" not in filename, f"unexpected dwi file: {filename}"
 
         # Test with quoted values
         parser = BIQLParser.from_string(
@@ -434,7 +464,12 @@ class TestBIQLEvaluator:
         )
         query = parser.parse()
         results = evaluator.evaluate(query)
-        # Should parse and execute without error
+
+        for result in results:
+            for filename in result["bold_files"]:
+                assert filename.split(".")[0].endswith(
+                    "_bold"
+                ), f"not a bold file: {filename}"
 
         # Test with numeric-like values
         parser = BIQLParser.from_string(
@@ -442,7 +477,10 @@ class TestBIQLEvaluator:
         )
         query = parser.parse()
         results = evaluator.evaluate(query)
-        # Should parse and execute without error
+
+        for result in results:
+            for filename in result["run01_files"]:
+                assert "_run-01_" in filename, f"not a run-01 file: {filename}"
 
     def test_array_agg_complex_conditions(self, evaluator):
         """Test complex WHERE conditions with AND/OR in ARRAY_AGG"""
@@ -527,10 +565,9 @@ class TestBIQLEvaluator:
 
     def test_parenthesized_distinct_syntax(self, evaluator):
         """Test new (DISTINCT field) syntax"""
-        parser = BIQLParser.from_string(
+        query = BIQLParser.parse_cached(
             "SELECT sub, (DISTINCT task) as tasks, COUNT(*) as total_files GROUP BY sub"
         )
-        query = parser.parse()
         results = evaluator.evaluate(query)
 
         for result in results:
@@ -549,10 +586,9 @@ class TestBIQLEvaluator:
 
     def test_parenthesized_non_distinct_syntax(self, evaluator):
         """Test new (field) syntax without DISTINCT - should include duplicates"""
-        parser = BIQLParser.from_string(
+        query = BIQLParser.parse_cached(
             "SELECT sub, (task) as all_tasks, COUNT(*) as total_files WHERE sub='01' GROUP BY sub"
         )
-        query = parser.parse()
         results = evaluator.evaluate(query)
 
         assert len(results) == 1
@@ -580,26 +616,23 @@ class TestBIQLEvaluator:
 
     def test_parenthesized_where_condition_syntax(self, evaluator):
         """Test new (field WHERE condition) syntax"""
-        parser = BIQLParser.from_string(
+        query = BIQLParser.parse_cached(
             "SELECT sub, (filename WHERE suffix='bold') as bold_files GROUP BY sub"
         )
-        query = parser.parse()
         results = evaluator.evaluate(query)
 
         for result in results:
             assert "bold_files" in result
             assert isinstance(result["bold_files"], list)
-
             # All filenames should contain 'bold'
             for filename in result["bold_files"]:
-                assert "bold" in filename
+                assert "bold" in filename, f"Unexpected file {filename}"
 
     def test_parenthesized_distinct_where_syntax(self, evaluator):
         """Test new (DISTINCT field WHERE condition) syntax"""
-        parser = BIQLParser.from_string(
+        query = BIQLParser.parse_cached(
             "SELECT sub, (DISTINCT datatype WHERE datatype IS NOT NULL) as datatypes GROUP BY sub"
         )
-        query = parser.parse()
         results = evaluator.evaluate(query)
 
         for result in results:
@@ -618,16 +651,14 @@ class TestBIQLEvaluator:
     def test_parenthesized_vs_array_agg_equivalence(self, evaluator):
         """Test that new syntax is equivalent to ARRAY_AGG"""
         # Test DISTINCT equivalence
-        parser1 = BIQLParser.from_string(
+        query1 = BIQLParser.parse_cached(
             "SELECT sub, (DISTINCT task) as tasks GROUP BY sub"
         )
-        query1 = parser1.parse()
         results1 = evaluator.evaluate(query1)
 
-        parser2 = BIQLParser.from_string(
+        query2 = BIQLParser.parse_cached(
             "SELECT sub, ARRAY_AGG(DISTINCT task) as tasks GROUP BY sub"
         )
-        query2 = parser2.parse()
         results2 = evaluator.evaluate(query2)
 
         # Sort results by sub for comparison
@@ -641,11 +672,10 @@ class TestBIQLEvaluator:
 
     def test_parenthesized_duplicates_count_consistency(self, evaluator):
         """Test that non-DISTINCT arrays have consistent counts"""
-        parser = BIQLParser.from_string(
+        query = BIQLParser.parse_cached(
             "SELECT sub, (task) as all_tasks, (datatype) as all_datatypes, COUNT(*) as total "
             "WHERE sub IN ['01', '02'] GROUP BY sub"
         )
-        query = parser.parse()
         results = evaluator.evaluate(query)
 
         for result in results:
@@ -663,12 +693,11 @@ class TestBIQLEvaluator:
 
     def test_array_agg_duplicates_count_consistency(self, evaluator):
         """Test that ARRAY_AGG without DISTINCT includes all values and matches COUNT(*)"""
-        parser = BIQLParser.from_string(
+        query = BIQLParser.parse_cached(
             "SELECT sub, ARRAY_AGG(task) as tasks, COUNT(*) as total_files "
             "WHERE sub IN ['01', '02', '03'] "
             "GROUP BY sub"
         )
-        query = parser.parse()
         results = evaluator.evaluate(query)
 
         for result in results:
@@ -683,42 +712,25 @@ class TestBIQLEvaluator:
                 none_count > 0
             ), f"Subject {result['sub']}: No None values found in tasks array"
 
-    def test_format_clause_in_query(self, evaluator):
+    @pytest.mark.parametrize(
+        "query_str,fmt",
+        [
+            ("SELECT sub, datatype WHERE datatype=func FORMAT json", "json"),
+            ("sub=01 FORMAT table", "table"),
+            ("SELECT * FORMAT csv", "csv"),
+            ("SELECT filename, sub, datatype GROUP BY datatype FORMAT tsv", "tsv"),
+            ("datatype=anat FORMAT paths", "paths"),
+        ],
+    )
+    def test_format_clause_in_query(self, query_str, fmt):
         """Test FORMAT clause within queries"""
-        # Test with json format
-        parser = BIQLParser.from_string(
-            "SELECT sub, datatype WHERE datatype=func FORMAT json"
-        )
-        query = parser.parse()
-        assert query.format == "json"
-
-        # Test with table format
-        parser = BIQLParser.from_string("sub=01 FORMAT table")
-        query = parser.parse()
-        assert query.format == "table"
+        assert BIQLParser.parse_cached(query_str).format == fmt
 
-        # Test with csv format
-        parser = BIQLParser.from_string("SELECT * FORMAT csv")
-        query = parser.parse()
-        assert query.format == "csv"
-
-        # Test with tsv format
-        parser = BIQLParser.from_string(
-            "SELECT filename, sub, datatype GROUP BY datatype FORMAT tsv"
-        )
-        query = parser.parse()
-        assert query.format == "tsv"
-
-        # Test with paths format
-        parser = BIQLParser.from_string("datatype=anat FORMAT paths")
-        query = parser.parse()
-        assert query.format == "paths"
-
-        # Test combined with all other clauses
-        parser = BIQLParser.from_string(
+    def test_format_clause_with_all_clauses(self):
+        """Test FORMAT clause combined with all other clauses"""
+        query = BIQLParser.parse_cached(
             "SELECT sub, COUNT(*) WHERE datatype=func GROUP BY sub HAVING COUNT(*) > 1 ORDER BY sub DESC FORMAT json"
         )
-        query = parser.parse()
         assert query.format == "json"
         assert query.select_clause is not None
         assert query.where_clause is not None
@@ -728,8 +740,7 @@ class TestBIQLEvaluator:
 
     def test_order_by_functionality(self, evaluator):
         """Test ORDER BY functionality"""
-        parser = BIQLParser.from_string("datatype=func ORDER BY sub ASC")
-        query = parser.parse()
+        query = BIQLParser.parse_cached("datatype=func ORDER BY sub ASC")
         results = evaluator.evaluate(query)
 
         if len(results) > 1:
@@ -742,20 +753,15 @@ class TestBIQLEvaluator:
         # Note: ORDER BY aggregate functions not supported in current implementation
 
         # Test mixed ASC/DESC ordering
-        parser = BIQLParser.from_string("ORDER BY datatype ASC, sub DESC")
-        query = parser.parse()
+        query = BIQLParser.parse_cached("ORDER BY datatype ASC, sub DESC")
         results = evaluator.evaluate(query)
 
         # Test ordering with NULL values
-        parser = BIQLParser.from_string("SELECT sub, run ORDER BY run ASC")
-        query = parser.parse()
+        query = BIQLParser.parse_cached("SELECT sub, run ORDER BY run ASC")
         results = evaluator.evaluate(query)
 
         # Check that non-null values are sorted correctly
-        non_null_runs = []
-        for result in results:
-            if result.get("run") is not None:
-                non_null_runs.append(result["run"])
+        non_null_runs = [r.get("run") for r in results if r.get("run") is not None]
 
         # Convert to comparable types and verify sorting
         if non_null_runs:
@@ -768,35 +774,21 @@ class TestBIQLEvaluator:
                 assert non_null_runs == sorted(non_null_runs)
 
         # Test ordering by multiple fields
-        parser = BIQLParser.from_string("ORDER BY sub ASC, ses ASC, run ASC")
-        query = parser.parse()
+        query = BIQLParser.parse_cached("ORDER BY sub ASC, ses ASC, run ASC")
         results = evaluator.evaluate(query)
 
-        # Verify complex ordering
-        for i in range(1, len(results)):
-            prev = results[i - 1]
-            curr = results[i]
-
-            # Primary sort by sub
-            if prev.get("sub") and curr.get("sub"):
-                if prev["sub"] < curr["sub"]:
-                    continue
-                elif prev["sub"] == curr["sub"]:
-                    # Secondary sort by ses
-                    if prev.get("ses") and curr.get("ses"):
-                        if prev["ses"] < curr["ses"]:
-                            continue
-                        elif prev["ses"] == curr["ses"]:
-                            # Tertiary sort by run
-                            if prev.get("run") and curr.get("run"):
-                                assert prev["run"] <= curr["run"]
+        # Verify complex ordering (missing values sort as empty strings)
+        keys = [
+            (r.get("sub") or "", r.get("ses") or "", r.get("run") or "")
+            for r in results
+        ]
+        assert keys == sorted(keys)
 
     def test_group_by_auto_aggregation(self, evaluator):
         """Test auto-aggregation of non-grouped fields in GROUP BY queries"""
-        parser = BIQLParser.from_string(
+        query = BIQLParser.parse_cached(
             "SELECT sub, task, filepath, COUNT(*) WHERE datatype=func GROUP BY sub"
         )
-        query = parser.parse()
         results = evaluator.evaluate(query)
 
         if len(results) > 0:
@@ -822,10 +814,9 @@ class TestBIQLEvaluator:
 
     def test_group_by_single_value_no_array(self, evaluator):
         """Test that single values don't become arrays in GROUP BY results"""
-        parser = BIQLParser.from_string(
+        query = BIQLParser.parse_cached(
             "SELECT sub, datatype, COUNT(*) WHERE datatype=func GROUP BY sub, datatype"
         )
-        query = parser.parse()
         results = evaluator.evaluate(query)
 
         if len(results) > 0:
@@ -839,8 +830,7 @@ class TestBIQLEvaluator:
     def test_group_by_multiple_values_array(self, evaluator):
         """Test that multiple values become arrays in GROUP BY results"""
         # Create test scenario with mixed datatypes
-        parser = BIQLParser.from_string("SELECT sub, datatype, COUNT(*) GROUP BY sub")
-        query = parser.parse()
+        query = BIQLParser.parse_cached("SELECT sub, datatype, COUNT(*) GROUP BY sub")
         results = evaluator.evaluate(query)
 
         if len(results) > 0:
@@ -857,10 +847,9 @@ class TestBIQLEvaluator:
 
     def test_group_by_non_distinct_auto_aggregation(self, evaluator):
         """Test that non-grouped fields include all values including duplicates and None"""
-        parser = BIQLParser.from_string(
+        query = BIQLParser.parse_cached(
             "SELECT sub, task, COUNT(*) as total " "WHERE sub='01' GROUP BY sub"
         )
-        query = parser.parse()
         results = evaluator.evaluate(query)
 
         assert len(results) == 1
@@ -885,8 +874,7 @@ class TestBIQLEvaluator:
 
     def test_group_by_preserves_null_handling(self, evaluator):
         """Test that None values are handled correctly in auto-aggregation"""
-        parser = BIQLParser.from_string("SELECT sub, run, COUNT(*) GROUP BY sub")
-        query = parser.parse()
+        query = BIQLParser.parse_cached("SELECT sub, run, COUNT(*) GROUP BY sub")
         results = evaluator.evaluate(query)
 
         if len(results) > 0:
@@ -904,62 +892,44 @@ class TestBIQLEvaluator:
     def test_distinct_functionality(self, evaluator):
         """Test DISTINCT functionality removes duplicate rows"""
         # First get some results that might have duplicates
-        parser = BIQLParser.from_string("SELECT datatype")
-        query = parser.parse()
+        query = BIQLParser.parse_cached("SELECT datatype")
         regular_results = evaluator.evaluate(query)
 
         # Now get DISTINCT results
-        parser = BIQLParser.from_string("SELECT DISTINCT datatype")
-        query = parser.parse()
+        query = BIQLParser.parse_cached("SELECT DISTINCT datatype")
         distinct_results = evaluator.evaluate(query)
 
         # DISTINCT should have fewer or equal results
         assert len(distinct_results) <= len(regular_results)
 
         # All results should be unique
-        seen_datatypes = set()
-        for result in distinct_results:
-            datatype = result.get("datatype")
-            assert (
-                datatype not in seen_datatypes
-            ), f"Duplicate datatype found: {datatype}"
-            seen_datatypes.add(datatype)
-
-    def test_distinct_multiple_fields(self, evaluator):
-        """Test DISTINCT with multiple fields"""
-        parser = BIQLParser.from_string("SELECT DISTINCT sub, datatype")
-        query = parser.parse()
-        results = evaluator.evaluate(query)
+        datatypes = [r.get("datatype") for r in distinct_results]
+        assert len(datatypes) == len(
+            set(datatypes)
+        ), f"Duplicate datatype found: {Counter(datatypes).most_common(1)}"
+
+    @pytest.mark.parametrize(
+        "query_str, fields",
+        [
+            ("SELECT DISTINCT sub, datatype", ("sub", "datatype")),
+            ("SELECT DISTINCT task WHERE datatype=func", ("task",)),
+        ],
+    )
+    def test_distinct_rows_unique(self, evaluator, query_str, fields):
+        """Test DISTINCT with multiple fields and combined with WHERE clause"""
+        results = evaluator.evaluate(BIQLParser.parse_cached(query_str))
 
         # Check that all combinations are unique
-        seen_combinations = set()
-        for result in results:
-            combination = (result.get("sub"), result.get("datatype"))
-            assert (
-                combination not in seen_combinations
-            ), f"Duplicate combination: {combination}"
-            seen_combinations.add(combination)
-
-    def test_distinct_with_where_clause(self, evaluator):
-        """Test DISTINCT combined with WHERE clause"""
-        parser = BIQLParser.from_string("SELECT DISTINCT task WHERE datatype=func")
-        query = parser.parse()
-        results = evaluator.evaluate(query)
-
-        # Should only have unique task values from functional files
-        seen_tasks = set()
-        for result in results:
-            task = result.get("task")
-            if task is not None:
-                assert task not in seen_tasks, f"Duplicate task found: {task}"
-                seen_tasks.add(task)
+        combinations = [tuple(r.get(field) for field in fields) for r in results]
+        assert len(combinations) == len(
+            set(combinations)
+        ), f"Duplicate combination: {Counter(combinations).most_common(1)}"
 
     def test_having_clause_functionality(self, evaluator):
         """Test HAVING clause with aggregate functions"""
-        parser = BIQLParser.from_string(
+        query = BIQLParser.parse_cached(
             "SELECT sub, COUNT(*) GROUP BY sub HAVING COUNT(*) > 2"
         )
-        query = parser.parse()
         results = evaluator.evaluate(query)
 
         # All results should have count > 2
@@ -970,10 +940,9 @@ class TestBIQLEvaluator:
     def test_having_clause_different_operators(self, evaluator):
         """Test HAVING clause with different comparison operators"""
         # Test >= operator
-        parser = BIQLParser.from_string(
+        query = BIQLParser.parse_cached(
             "SELECT datatype, COUNT(*) GROUP BY datatype HAVING COUNT(*) >= 1"
         )
-        query = parser.parse()
         results = evaluator.evaluate(query)
 
         for result in results:
@@ -981,10 +950,9 @@ class TestBIQLEvaluator:
             assert count >= 1
 
         # Test < operator (should return empty for reasonable datasets)
-        parser = BIQLParser.from_string(
+        query = BIQLParser.parse_cached(
             "SELECT sub, COUNT(*) GROUP BY sub HAVING COUNT(*) < 1"
         )
-        query = parser.parse()
         results = evaluator.evaluate(query)
         # Should be empty since no subject can have < 1 files
         assert len(results) == 0
@@ -992,16 +960,14 @@ class TestBIQLEvaluator:
     def test_error_handling_invalid_field_comparison(self, evaluator):
         """Test error handling for invalid field comparisons"""
         # This should not crash, just return no results for non-existent fields
-        parser = BIQLParser.from_string("nonexistent_field=value")
-        query = parser.parse()
+        query = BIQLParser.parse_cached("nonexistent_field=value")
         results = evaluator.evaluate(query)
         assert len(results) == 0
 
     def test_error_handling_type_conversion(self, evaluator):
         """Test error handling for type conversion in comparisons"""
         # Test numeric comparison with non-numeric string (falls back to string)
-        parser = BIQLParser.from_string("sub>999")  # sub is usually a string like "01"
-        query = parser.parse()
+        query = BIQLParser.parse_cached("sub>999")  # sub is usually a string like "01"
         results = evaluator.evaluate(query)
         # Should not crash, may return results based on string comparison
         assert isinstance(results, list)
@@ -1009,8 +975,7 @@ class TestBIQLEvaluator:
     def test_field_existence_checks(self, evaluator):
         """Test field existence behavior with WHERE field syntax"""
         # Test basic entity existence check
-        parser = BIQLParser.from_string("WHERE sub")
-        query = parser.parse()
+        query = BIQLParser.parse_cached("WHERE sub")
         results = evaluator.evaluate(query)
 
         # All results should have sub field (since it's a core BIDS entity)
@@ -1019,8 +984,7 @@ class TestBIQLEvaluator:
             assert result["sub"] is not None
 
         # Test metadata field existence
-        parser = BIQLParser.from_string("WHERE metadata.RepetitionTime")
-        query = parser.parse()
+        query = BIQLParser.parse_cached("WHERE metadata.RepetitionTime")
         results = evaluator.evaluate(query)
 
         # Only files with RepetitionTime metadata should be returned
@@ -1032,8 +996,7 @@ class TestBIQLEvaluator:
                     assert "RepetitionTime" in metadata or len(results) == 0
 
         # Test with DISTINCT for entity discovery pattern
-        parser = BIQLParser.from_string("SELECT DISTINCT task WHERE task")
-        query = parser.parse()
+        query = BIQLParser.parse_cached("SELECT DISTINCT task WHERE task")
         results = evaluator.evaluate(query)
 
         # All results should have non-null task values
@@ -1043,8 +1006,7 @@ class TestBIQLEvaluator:
             assert result["task"] != ""
 
         # Test non-existent field existence check
-        parser = BIQLParser.from_string("WHERE nonexistent_field")
-        query = parser.parse()
+        query = BIQLParser.parse_cached("WHERE nonexistent_field")
         results = evaluator.evaluate(query)
 
         # Should return empty results since field doesn't exist
@@ -1053,13 +1015,11 @@ class TestBIQLEvaluator:
     def test_field_existence_vs_comparison(self, evaluator):
         """Test difference between field existence (WHERE field) and null comparison"""
         # Get baseline - all files
-        parser = BIQLParser.from_string("SELECT filename")
-        query = parser.parse()
+        query = BIQLParser.parse_cached("SELECT filename")
         all_results = evaluator.evaluate(query)
 
         # Test field existence filter with field included in SELECT
-        parser = BIQLParser.from_string("SELECT filename, run WHERE run")
-        query = parser.parse()
+        query = BIQLParser.parse_cached("SELECT filename, run WHERE run")
         existence_results = evaluator.evaluate(query)
 
         # Existence check should return subset of all results
@@ -1071,8 +1031,7 @@ class TestBIQLEvaluator:
             assert result["run"] is not None
 
         # Test with just WHERE clause (no SELECT) - should include all fields
-        parser = BIQLParser.from_string("WHERE run")
-        query = parser.parse()
+        query = BIQLParser.parse_cached("WHERE run")
         no_select_results = evaluator.evaluate(query)
 
         # Should include run field and it should be non-null
@@ -1083,8 +1042,7 @@ class TestBIQLEvaluator:
     def test_entity_discovery_patterns(self, evaluator):
         """Test the entity discovery patterns from documentation examples"""
         # Test: What acquisitions are available?
-        parser = BIQLParser.from_string("SELECT DISTINCT acq WHERE acq")
-        query = parser.parse()
+        query = BIQLParser.parse_cached("SELECT DISTINCT acq WHERE acq")
         results = evaluator.evaluate(query)
 
         # Should only return files that have acq entity
@@ -1094,10 +1052,9 @@ class TestBIQLEvaluator:
             assert result["acq"] != ""
 
         # Test: What echo times are used?
-        parser = BIQLParser.from_string(
+        query = BIQLParser.parse_cached(
             "SELECT DISTINCT metadata.EchoTime WHERE metadata.EchoTime ORDER BY metadata.EchoTime"
         )
-        query = parser.parse()
         results = evaluator.evaluate(query)
 
         # Should only return files with EchoTime metadata
@@ -1124,13 +1081,11 @@ class TestBIQLEvaluator:
         # Test with a field that likely has some null values (run)
 
         # Get all distinct run values (including null)
-        parser = BIQLParser.from_string("SELECT DISTINCT run")
-        query = parser.parse()
+        query = BIQLParser.parse_cached("SELECT DISTINCT run")
         all_runs = evaluator.evaluate(query)
 
         # Get only non-null run values
-        parser = BIQLParser.from_string("SELECT DISTINCT run WHERE run")
-        query = parser.parse()
+        query = BIQLParser.parse_cached("SELECT DISTINCT run WHERE run")
         non_null_runs = evaluator.evaluate(query)
 
         # The WHERE clause should filter out null values
@@ -1142,15 +1097,13 @@ class TestBIQLEvaluator:
             assert result["run"] is not None
 
         # Check if we found the null case (some files without run)
-        null_runs = [r for r in all_runs if r.get("run") is None]
-        non_null_runs_from_all = [r for r in all_runs if r.get("run") is not None]
+        null_count = sum(r.get("run") is None for r in all_runs)
 
-        if len(null_runs) > 0:
+        if null_count > 0:
             # We have files without run values - verify filtering works
-            assert len(non_null_runs) == len(non_null_runs_from_all)
-            assert len(all_runs) == len(non_null_runs) + len(null_runs)
+            assert len(all_runs) == len(non_null_runs) + null_count
             print(
-                f"Found {len(null_runs)} files without run values - WHERE clause properly filtered them"
+                f"Found {null_count} files without run values - WHERE clause properly filtered them"
             )
         else:
             # All files have run values - both queries should return same results
@@ -1160,14 +1113,12 @@ class TestBIQLEvaluator:
             )
 
         # Test with a metadata field that's more likely to have nulls
-        parser = BIQLParser.from_string("SELECT DISTINCT metadata.EchoTime")
-        query = parser.parse()
+        query = BIQLParser.parse_cached("SELECT DISTINCT metadata.EchoTime")
         all_echo_times = evaluator.evaluate(query)
 
-        parser = BIQLParser.from_string(
+        query = BIQLParser.parse_cached(
             "SELECT DISTINCT metadata.EchoTime WHERE metadata.EchoTime"
         )
-        query = parser.parse()
         non_null_echo_times = evaluator.evaluate(query)
 
         # Should filter out null metadata
@@ -1178,72 +1129,101 @@ class TestBIQLEvaluator:
             if "metadata.EchoTime" in result:
                 assert result["metadata.EchoTime"] is not None
 
-    def test_distinct_null_filtering_controlled_example(self):
+    def test_distinct_null_filtering_controlled_example(self, tmp_path):
         """Test DISTINCT with/without WHERE using controlled dataset to show exact difference"""
-        import json
-        import tempfile
-        from pathlib import Path
-
-        with tempfile.TemporaryDirectory() as tmpdir:
-            tmpdir = Path(tmpdir)
-            (tmpdir / "dataset_description.json").write_text(
-                json.dumps({"Name": "Null Test Dataset", "BIDSVersion": "1.8.0"})
-            )
-
-            # Create files: some with run, some without
-            test_files = [
-                "sub-01/func/sub-01_task-rest_run-01_bold.nii.gz",  # Has run
-                "sub-01/func/sub-01_task-rest_run-02_bold.nii.gz",  # Has run
-                "sub-01/anat/sub-01_T1w.nii.gz",  # No run (typical for anat)
-                "sub-02/func/sub-02_task-rest_run-01_bold.nii.gz",  # Has run
-                "sub-02/anat/sub-02_T1w.nii.gz",  # No run
-            ]
-
-            for file_path in test_files:
-                full_path = tmpdir / file_path
-                full_path.parent.mkdir(parents=True, exist_ok=True)
-                full_path.touch()
+        (tmp_path / "dataset_description.json").write_text(
+            json.dumps({"Name": "Null Test Dataset", "BIDSVersion": "1.8.0"})
+        )
 
-            dataset = BIDSDataset(tmpdir)
-            evaluator = BIQLEvaluator(dataset)
+        # Create files: some with run, some without
+        test_files = [
+            "sub-01/func/sub-01_task-rest_run-01_bold.nii.gz",  # Has run
+            "sub-01/func/sub-01_task-rest_run-02_bold.nii.gz",  # Has run
+            "sub-01/anat/sub-01_T1w.nii.gz",  # No run (typical for anat)
+            "sub-02/func/sub-02_task-rest_run-01_bold.nii.gz",  # Has run
+            "sub-02/anat/sub-02_T1w.nii.gz",  # No run
+        ]
 
-            # Test 1: All distinct run values (including null)
-            parser = BIQLParser.from_string("SELECT DISTINCT run")
-            query = parser.parse()
-            all_runs = evaluator.evaluate(query)
+        for file_path in test_files:
+            full_path = tmp_path / file_path
+            full_path.parent.mkdir(parents=True, exist_ok=True)
+            full_path.touch()
 
-            # Test 2: Only non-null run values
-            parser = BIQLParser.from_string("SELECT DISTINCT run WHERE run")
-            query = parser.parse()
-            non_null_runs = evaluator.evaluate(query)
+        dataset = BIDSDataset(tmp_path)
+        evaluator = BIQLEvaluator(dataset)
 
-            # Verify the expected difference
-            print(f"All distinct runs: {[r.get('run') for r in all_runs]}")
-            print(f"Non-null runs: {[r.get('run') for r in non_null_runs]}")
+        # Test 1: All distinct run values (including null)
+        query = BIQLParser.parse_cached("SELECT DISTINCT run")
+        all_runs = evaluator.evaluate(query)
 
-            # Should find: null, "01", "02" vs just "01", "02"
-            assert len(all_runs) == 3  # [null, "01", "02"]
-            assert len(non_null_runs) == 2  # ["01", "02"]
+        # Test 2: Only non-null run values
+        query = BIQLParser.parse_cached("SELECT DISTINCT run WHERE run")
+        non_null_runs = evaluator.evaluate(query)
 
-            # Verify null is in all_runs but not in non_null_runs
-            null_count_all = len([r for r in all_runs if r.get("run") is None])
-            null_count_filtered = len(
-                [r for r in non_null_runs if r.get("run") is None]
-            )
+        # Verify the expected difference
+        print(f"All distinct runs: {[r.get('run') for r in all_runs]}")
+        print(f"Non-null runs: {[r.get('run') for r in non_null_runs]}")
+
+        # Should find: null, "01", "02" vs just "01", "02"
+        assert len(all_runs) == 3  # [null, "01", "02"]
+        assert len(non_null_runs) == 2  # ["01", "02"]
+
+        # Verify null is in all_runs but not in non_null_runs
+        runs_all = [r.get("run") for r in all_runs]
+        runs_filtered = [r.get("run") for r in non_null_runs]
+
+        assert runs_all.count(None) == 1  # One null entry in unfiltered results
+        assert None not in runs_filtered  # No null entries in filtered results
+
+        # Verify the non-null entries match
+        runs_all.remove(None)
+        assert sorted(runs_all) == sorted(runs_filtered)  # Same non-null values
+
+    @pytest.mark.parametrize(
+        "query_str",
+        [
+            "datatype=func",
+            "task=nback AND sub=01",
+            "datatype=func AND task=nback AND run=01",
+            'sub~="0[1-3]"',
+            'task~="n.*" AND datatype=func',
+            "participants.age>25",
+            "participants.sex=M AND datatype=func",
+            "participants.sex!=M",
+            "sub=1",
+            "sub=0*",
+            "suffix=bold AND datatype=func AND metadata.RepetitionTime>0",
+        ],
+    )
+    def test_indexed_equality_matches_full_scan(
+        self, evaluator, monkeypatch, query_str
+    ):
+        """Test entity-index narrowing of WHERE returns the same files as a scan"""
+        query = BIQLParser.from_string(query_str).parse()
+        results = evaluator.evaluate(query)
+        matched = [f.filepath for f in evaluator.get_original_matching_files()]
 
-            assert null_count_all == 1  # One null entry in unfiltered results
-            assert null_count_filtered == 0  # No null entries in filtered results
+        # Evaluate again with every file as a candidate
+        monkeypatch.setattr(
+            evaluator, "_candidate_files", lambda expr: evaluator.dataset.files
+        )
+        assert evaluator.evaluate(query) == results
+        scanned = [f.filepath for f in evaluator.get_original_matching_files()]
+        assert matched == scanned
 
-            # Verify the non-null entries match
-            runs_all = [r.get("run") for r in all_runs if r.get("run") is not None]
-            runs_filtered = [r.get("run") for r in non_null_runs]
+    def test_evaluate_text_reuses_compiled_predicate(self, evaluator):
+        """Test evaluate_text matches evaluate and compiles a repeated query once"""
+        query_str = "SELECT sub, run WHERE datatype=func AND task=nback ORDER BY sub"
+        expected = evaluator.evaluate(BIQLParser.parse_cached(query_str))
 
-            assert sorted(runs_all) == sorted(runs_filtered)  # Same non-null values
+        assert evaluator.evaluate_text(query_str) == expected
+        predicate = evaluator._predicate_cache[query_str]
+        assert evaluator.evaluate_text(query_str) == expected
+        assert evaluator._predicate_cache[query_str] is predicate
 
     def test_not_operator(self, evaluator):
         """Test NOT operator functionality"""
-        parser = BIQLParser.from_string("NOT datatype=func")
-        query = parser.parse()
+        query = BIQLParser.parse_cached("NOT datatype=func")
         results = evaluator.evaluate(query)
 
         # Should only return non-functional files
@@ -1253,8 +1233,7 @@ class TestBIQLEvaluator:
 
     def test_in_operator_with_lists(self, evaluator):
         """Test IN operator with list values"""
-        parser = BIQLParser.from_string("sub IN [01, 02, 03]")
-        query = parser.parse()
+        query = BIQLParser.parse_cached("sub IN [01, 02, 03]")
         results = evaluator.evaluate(query)
 
         for result in results:
@@ -1264,8 +1243,7 @@ class TestBIQLEvaluator:
 
     def test_like_operator(self, evaluator):
         """Test LIKE operator for SQL-style pattern matching"""
-        parser = BIQLParser.from_string("task LIKE %back%")
-        query = parser.parse()
+        query = BIQLParser.parse_cached("task LIKE %back%")
         results = evaluator.evaluate(query)
 
         for result in results:
@@ -1273,57 +1251,12 @@ class TestBIQLEvaluator:
             if task is not None:
                 assert "back" in task
 
-    @pytest.fixture
-    def reserved_keyword_dataset(self):
-        """Create a test dataset with reserved keywords in participants.tsv"""
-        tmpdir = Path(tempfile.mkdtemp())
-
-        # Dataset description
-        (tmpdir / "dataset_description.json").write_text(
-            json.dumps({"Name": "ReservedKeywordTest", "BIDSVersion": "1.8.0"})
-        )
-
-        # Participants file with 'group' field (reserved keyword)
-        (tmpdir / "participants.tsv").write_text(
-            "participant_id\tage\tsex\tgroup\tsite\n"
-            "sub-01\t25\tF\tcontrol\tSiteA\n"
-            "sub-02\t28\tM\tpatient\tSiteA\n"
-            "sub-03\t22\tF\tcontrol\tSiteB\n"
-        )
-
-        # Create test files with specific naming for type coercion tests
-        files = [
-            ("sub-01/anat/sub-01_T1w.nii.gz", {}),
-            ("sub-01/func/sub-01_task-rest_bold.nii.gz", {"RepetitionTime": 2.0}),
-            ("sub-02/anat/sub-02_T1w.nii.gz", {}),
-            ("sub-02/func/sub-02_task-rest_bold.nii.gz", {"RepetitionTime": 2.0}),
-            ("sub-03/func/sub-03_task-rest_bold.nii.gz", {"RepetitionTime": 2.0}),
-        ]
-
-        for file_path, metadata in files:
-            full_path = tmpdir / file_path
-            full_path.parent.mkdir(parents=True, exist_ok=True)
-            full_path.touch()
-
-            # Create JSON metadata if provided
-            if metadata:
-                json_path = full_path.with_suffix(".json")
-                json_path.write_text(json.dumps(metadata))
-
-        return BIDSDataset(tmpdir)
-
-    @pytest.fixture
-    def reserved_keyword_evaluator(self, reserved_keyword_dataset):
-        """Evaluator for reserved keyword dataset"""
-        return BIQLEvaluator(reserved_keyword_dataset)
-
     def test_reserved_keyword_participants_group_parsing(
         self, reserved_keyword_evaluator
     ):
         """Test that participants.group parses correctly despite 'group' being a reserved keyword"""
         # Test basic SELECT with reserved keyword
-        parser = BIQLParser.from_string("SELECT participants.group")
-        query = parser.parse()
+        query = BIQLParser.parse_cached("SELECT participants.group")
         results = reserved_keyword_evaluator.evaluate(query)
 
         assert len(results) > 0
@@ -1338,10 +1271,9 @@ class TestBIQLEvaluator:
     ):
         """Test filtering by participants.group field"""
         # Test WHERE clause with reserved keyword
-        parser = BIQLParser.from_string(
+        query = BIQLParser.parse_cached(
             "SELECT sub, participants.group WHERE participants.group=control"
         )
-        query = parser.parse()
         results = reserved_keyword_evaluator.evaluate(query)
 
         assert len(results) > 0
@@ -1353,8 +1285,7 @@ class TestBIQLEvaluator:
     def test_in_operator_numeric_string_coercion(self, reserved_keyword_evaluator):
         """Test IN operator with numbers that should match zero-padded string subjects"""
         # Test basic number to zero-padded string conversion
-        parser = BIQLParser.from_string("sub IN [1, 2, 3]")
-        query = parser.parse()
+        query = BIQLParser.parse_cached("sub IN [1, 2, 3]")
         results = reserved_keyword_evaluator.evaluate(query)
 
         assert len(results) > 0
@@ -1364,8 +1295,7 @@ class TestBIQLEvaluator:
     def test_in_operator_mixed_numeric_formats(self, reserved_keyword_evaluator):
         """Test IN operator with mixed numeric formats"""
         # Test both padded and unpadded numbers
-        parser = BIQLParser.from_string("sub IN [01, 2, 03]")
-        query = parser.parse()
+        query = BIQLParser.parse_cached("sub IN [01, 2, 03]")
         results = reserved_keyword_evaluator.evaluate(query)
 
         assert len(results) > 0
@@ -1377,10 +1307,9 @@ class TestBIQLEvaluator:
     ):
         """Test both fixes working together: reserved keyword and IN operator coercion"""
         # Test complex query using both fixes
-        parser = BIQLParser.from_string(
+        query = BIQLParser.parse_cached(
             "SELECT participants.group WHERE sub IN [1, 3] AND participants.group=control"
         )
-        query = parser.parse()
         results = reserved_keyword_evaluator.evaluate(query)
 
         assert len(results) > 0
@@ -1402,8 +1331,7 @@ class TestBIQLEvaluator:
     def test_computed_field_wildcard_patterns(self, reserved_keyword_evaluator):
         """Test wildcard patterns with computed fields like filename, filepath"""
         # Test filename wildcard matching
-        parser = BIQLParser.from_string("SELECT filename WHERE filename=*bold*")
-        query = parser.parse()
+        query = BIQLParser.parse_cached("SELECT filename WHERE filename=*bold*")
         results = reserved_keyword_evaluator.evaluate(query)
 
         assert len(results) > 0
@@ -1413,8 +1341,7 @@ class TestBIQLEvaluator:
             assert "bold" in filename
 
         # Test T1w pattern
-        parser = BIQLParser.from_string("SELECT filename WHERE filename=*T1w*")
-        query = parser.parse()
+        query = BIQLParser.parse_cached("SELECT filename WHERE filename=*T1w*")
         results = reserved_keyword_evaluator.evaluate(query)
 
         assert len(results) > 0
@@ -1424,8 +1351,7 @@ class TestBIQLEvaluator:
             assert "T1w" in filename
 
         # Test filepath pattern - should only return func files
-        parser = BIQLParser.from_string("SELECT filepath WHERE filepath=*/func/*")
-        query = parser.parse()
+        query = BIQLParser.parse_cached("SELECT filepath WHERE filepath=*/func/*")
         results = reserved_keyword_evaluator.evaluate(query)
 
         # Should only return functional files (not anat files)
@@ -1446,8 +1372,7 @@ class TestBIQLEvaluator:
 
     def test_regex_match_operator(self, evaluator):
         """Test regex MATCH operator (~=)"""
-        parser = BIQLParser.from_string('sub~="0[1-3]"')
-        query = parser.parse()
+        query = BIQLParser.parse_cached('sub~="0[1-3]"')
         results = evaluator.evaluate(query)
 
         for result in results:
@@ -1455,33 +1380,44 @@ class TestBIQLEvaluator:
             if sub is not None:
                 assert sub in ["01", "02", "03"]
 
+    def test_precompiled_patterns_match_fnmatch(self, evaluator):
+        """Test precompiled wildcard, LIKE and regex patterns against fnmatch"""
+        filenames = [f.filepath.name for f in evaluator.dataset.files]
+        for query_str, pattern in [
+            ('filename="*bold*"', "*bold*"),
+            ('filename="*[bB]old*"', "*[bB]old*"),
+            ('filename LIKE "%_T1w.nii.gz"', "*?T1w.nii.gz"),
+            ('filename="sub-01*"', "sub-01*"),
+            ('filename="*_bold.nii.gz"', "*_bold.nii.gz"),
+            ('filename LIKE "sub-02%"', "sub-02*"),
+            ('filename LIKE "%.json"', "*.json"),
+        ]:
+            results = evaluator.evaluate(BIQLParser.parse_cached(query_str))
+            expected = [n for n in filenames if fnmatch.fnmatch(n, pattern)]
+            assert [r["filename"] for r in results] == expected
+
+        # Invalid regular expressions match nothing rather than raising
+        assert evaluator.evaluate(BIQLParser.parse_cached('task~="[unclosed"')) == []
+
     def test_range_syntax_formats(self, evaluator):
         """Test various range syntax formats"""
         # Test basic range [1:3] - should include 1, 2, and 3
-        parser = BIQLParser.from_string("run=[1:3]")
-        query = parser.parse()
+        query = BIQLParser.parse_cached("run=[1:3]")
         results = evaluator.evaluate(query)
 
         # Must return some results
         assert len(results) > 0, "Range query [1:3] returned no results"
 
-        # Verify all runs are in range
+        # Verify all runs are in range; non-integer runs raise ValueError here
         for result in results:
             run = result.get("run")
             if run is not None:
-                try:
-                    run_num = int(run)
-                    assert 1 <= run_num <= 3, f"Run {run_num} outside range [1:3]"
-                except ValueError:
-                    pytest.fail(
-                        f"Run value '{run}' cannot be converted to integer for range comparison"
-                    )
+                assert int(run) in {1, 2, 3}, f"Run {run} outside range [1:3]"
 
     def test_metadata_field_access_edge_cases(self, evaluator):
         """Test metadata field access with missing values"""
         # Test accessing nested metadata that doesn't exist
-        parser = BIQLParser.from_string("metadata.NonExistentField=value")
-        query = parser.parse()
+        query = BIQLParser.parse_cached("metadata.NonExistentField=value")
         results = evaluator.evaluate(query)
 
         # Should return empty results without crashing
@@ -1490,8 +1426,7 @@ class TestBIQLEvaluator:
     def test_participants_field_access_edge_cases(self, evaluator):
         """Test participants data access with missing values"""
         # Test accessing participant data for non-existent field
-        parser = BIQLParser.from_string("participants.nonexistent=value")
-        query = parser.parse()
+        query = BIQLParser.parse_cached("participants.nonexistent=value")
         results = evaluator.evaluate(query)
 
         # Should not crash, may return empty results
@@ -1524,49 +1459,38 @@ class TestBIQLEvaluator:
         evaluator = BIQLEvaluator(dataset)
 
         # Test COUNT(DISTINCT sub) - should return 2 (sub-01, sub-02)
-        parser = BIQLParser.from_string("SELECT COUNT(DISTINCT sub) as unique_subjects")
-        query = parser.parse()
+        query = BIQLParser.parse_cached("SELECT COUNT(DISTINCT sub) as unique_subjects")
         results = evaluator.evaluate(query)
 
         assert len(results) == 1
         assert results[0]["unique_subjects"] == 2
 
         # Test COUNT(DISTINCT task) - should return 2 (rest, nback)
-        parser = BIQLParser.from_string("SELECT COUNT(DISTINCT task) as unique_tasks")
-        query = parser.parse()
+        query = BIQLParser.parse_cached("SELECT COUNT(DISTINCT task) as unique_tasks")
         results = evaluator.evaluate(query)
 
         assert len(results) == 1
         assert results[0]["unique_tasks"] == 2
 
         # Test COUNT(DISTINCT run) grouped by task
-        parser = BIQLParser.from_string(
-            """
+        query = BIQLParser.parse_cached("""
             SELECT task, COUNT(DISTINCT run) as unique_runs
             GROUP BY task
-        """
-        )
-        query = parser.parse()
+        """)
         results = evaluator.evaluate(query)
 
         assert len(results) == 2
 
-        # Find results by task
-        rest_result = next(r for r in results if r["task"] == "rest")
-        nback_result = next(r for r in results if r["task"] == "nback")
-
-        assert rest_result["unique_runs"] == 2  # runs 1 and 2
-        assert nback_result["unique_runs"] == 1  # only run 1
+        by_task = {r["task"]: r for r in results}
+        assert by_task["rest"]["unique_runs"] == 2  # runs 1 and 2
+        assert by_task["nback"]["unique_runs"] == 1  # only run 1
 
         # Test COUNT(DISTINCT sub) in HAVING clause
-        parser = BIQLParser.from_string(
-            """
+        query = BIQLParser.parse_cached("""
             SELECT task, COUNT(DISTINCT sub) as unique_subjects
             GROUP BY task
             HAVING COUNT(DISTINCT sub) > 1
-        """
-        )
-        query = parser.parse()
+        """)
         results = evaluator.evaluate(query)
 
         # Only 'rest' task has files from multiple subjects (01 and 02)
@@ -1574,6 +1498,15 @@ class TestBIQLEvaluator:
         assert results[0]["task"] == "rest"
         assert results[0]["unique_subjects"] == 2
 
+        # WHERE clauses fall back to a full scan without an entity index
+        query = BIQLParser.parse_cached(
+            "SELECT COUNT(DISTINCT run) as unique_runs WHERE task=rest AND sub=01"
+        )
+        results = evaluator.evaluate(query)
+
+        assert len(results) == 1
+        assert results[0]["unique_runs"] == 2
+
 
 if __name__ == "__main__":
     # Run specific test categories
@@ -4,6 +4,8 @@ Comprehensive tests for BIDS Query Language (BIQL)
 Tests all components of the BIQL implementation using real BIDS examples.
 """
 
+import csv
+import io
 import json
 
 import pytest
@@ -22,17 +24,14 @@ class TestBIQLFormatter:
         ]
 
         formatted = BIQLFormatter.format(results, "json")
-        parsed = json.loads(formatted)
-
-        assert len(parsed) == 2
-        assert parsed[0]["sub"] == "01"
+        assert json.loads(formatted) == results
 
     def test_table_formatting(self):
         """Test table output formatting"""
         results = [{"sub": "01", "task": "nback"}, {"sub": "02", "task": "rest"}]
 
         formatted = BIQLFormatter.format(results, "table")
-        lines = formatted.split("\n")
+        lines = formatted.splitlines()
 
         assert len(lines) >= 4  # Header + separator + 2 data rows
         assert "sub" in lines[0]
@@ -44,11 +43,9 @@ class TestBIQLFormatter:
         results = [{"sub": "01", "task": "nback"}, {"sub": "02", "task": "rest"}]
 
         formatted = BIQLFormatter.format(results, "csv")
-        lines = formatted.strip().split("\n")
+        rows = list(csv.reader(io.StringIO(formatted)))
 
-        assert len(lines) >= 3  # Header + 2 data rows
-        assert "sub" in lines[0]
-        assert "task" in lines[0]
+        assert rows == [["sub", "task"], ["01", "nback"], ["02", "rest"]]
 
     def test_paths_formatting(self):
         """Test paths output formatting"""
@@ -82,14 +79,13 @@ class TestBIQLFormatter:
         ]
 
         formatted = BIQLFormatter.format(results, "tsv")
-        lines = formatted.strip().split("\n")
+        rows = list(csv.reader(io.StringIO(formatted), delimiter="\t"))
 
-        assert len(lines) >= 3  # Header + 2 data rows
-        assert "sub" in lines[0]
-        assert "task" in lines[0]
-        assert "datatype" in lines[0]
-        assert "\t" in lines[0]  # TSV should use tabs
-        assert "01" in lines[1] or "01" in lines[2]
+        assert rows == [
+            ["sub", "task", "datatype"],
+            ["01", "nback", "func"],
+            ["02", "rest", "func"],
+        ]
 
     def test_unknown_format_fallback(self):
         """Test unknown format falls back to JSON"""
@@ -97,9 +93,7 @@ class TestBIQLFormatter:
 
         formatted = BIQLFormatter.format(results, "unknown_format")
         # Should fall back to JSON format
-        parsed = json.loads(formatted)
-        assert len(parsed) == 1
-        assert parsed[0]["sub"] == "01"
+        assert json.loads(formatted) == results
 
     def test_json_contains_only_select_fields(self):
         """Test that JSON output contains only the fields specified in SELECT, no internal fields"""
@@ -110,23 +104,9 @@ class TestBIQLFormatter:
         ]
 
         formatted = BIQLFormatter.format(results, "json")
-        parsed = json.loads(formatted)
 
-        # Verify structure and content
-        assert len(parsed) == 2
-
-        # Each result should contain exactly the expected fields, no more
-        for result in parsed:
-            assert set(result.keys()) == {"sub", "task", "total_files"}
-            assert "sub" in result
-            assert "task" in result
-            assert "total_files" in result
-
-            # Most importantly: no internal fields should be present
-            for key in result.keys():
-                assert not key.startswith(
-                    "_"
-                ), f"Found internal field '{key}' in JSON output"
+        # Exactly the selected fields, so no internal fields are present
+        assert json.loads(formatted) == results
 
     def test_complex_value_formatting(self):
         """Test formatting of complex values (lists, nested dicts)"""
@@ -181,14 +161,16 @@ class TestBIQLFormatter:
         ]
 
         formatted = BIQLFormatter.format(results, "csv")
-        lines = formatted.strip().split("\n")
-
-        # Check header
-        assert "sub" in lines[0]
-        assert "value" in lines[0]
+        rows = list(csv.reader(io.StringIO(formatted)))
 
         # Check that different value types are handled
-        assert len(lines) >= 5  # Header + 4 data rows
+        assert rows == [
+            ["sub", "value"],
+            ["01", ""],
+            ["02", "true"],
+            ["03", "123"],
+            ["04", '["a","b"]'],
+        ]
 
     def test_empty_keys_handling(self):
         """Test handling of empty or missing keys"""
@@ -262,6 +244,23 @@ class TestBIQLFormatter:
         assert lines[1] == "/data/sub-01_task-rest_bold.nii"
         assert lines[2] == "/data/sub-02_task-rest_bold.nii"
 
+    @pytest.mark.parametrize("format_type", ["json", "csv", "tsv", "table", "paths"])
+    @pytest.mark.parametrize(
+        "results",
+        [
+            [],
+            [
+                {"sub": "01", "metadata": {"EchoTime": 0.01}, "filepath": "/a.nii"},
+                {"sub": "02", "run": ["1", "2"], "_count": 2},
+            ],
+        ],
+    )
+    def test_write_matches_format(self, format_type, results):
+        """Test streaming to a file object produces the same text as format"""
+        out = io.StringIO()
+        BIQLFormatter.write(results, out, format_type)
+        assert out.getvalue() == BIQLFormatter.format(results, format_type)
+
 
 if __name__ == "__main__":
     # Run specific test categories
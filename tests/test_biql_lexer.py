@@ -58,10 +58,13 @@ class TestBIQLLexer:
         lexer = BIQLLexer(query)
         tokens = lexer.tokenize()
 
-        assert any(t.type == TokenType.SELECT for t in tokens)
-        assert any(t.type == TokenType.WHERE for t in tokens)
-        assert any(t.type == TokenType.LPAREN for t in tokens)
-        assert any(t.type == TokenType.RPAREN for t in tokens)
+        types = {t.type for t in tokens}
+        assert {
+            TokenType.SELECT,
+            TokenType.WHERE,
+            TokenType.LPAREN,
+            TokenType.RPAREN,
+        } <= types
 
 
 if __name__ == "__main__":
@@ -98,6 +98,13 @@ class TestBIQLParser:
         assert query.group_by is not None
         assert query.having is not None
 
+    def test_parse_cached(self):
+        """Test cached parsing reuses one AST per distinct query string"""
+        query = BIQLParser.parse_cached("SELECT sub WHERE datatype=func")
+
+        assert query is BIQLParser.parse_cached("SELECT sub WHERE datatype=func")
+        assert query == BIQLParser.from_string("SELECT sub WHERE datatype=func").parse()
+
     def test_function_call_parsing_with_arguments(self):
         """Test parsing function calls with different argument types"""
         # Function with STAR argument
@@ -4,13 +4,9 @@ Comprehensive tests for BIDS Query Language (BIQL)
 Tests all components of the BIQL implementation using real BIDS examples.
 """
 
-import tempfile
-from pathlib import Path
-
 import pytest
 
 from biql.dataset import BIDSDataset
-from biql.evaluator import BIQLEvaluator
 from biql.parser import BIQLParser
 
 
@@ -22,6 +18,13 @@ class TestErrorHandling:
         with pytest.raises(ValueError):
             BIDSDataset("/nonexistent/path")
 
+    def test_dataset_path_is_file(self, tmp_path):
+        """Test a file passed as the dataset root is rejected before indexing"""
+        description = tmp_path / "dataset_description.json"
+        description.write_text("{}")
+        with pytest.raises(ValueError, match="not a directory"):
+            BIDSDataset(description)
+
     def test_empty_query(self):
         """Test handling of empty queries"""
         parser = BIQLParser.from_string("")
@@ -31,26 +34,14 @@ class TestErrorHandling:
         assert query.where_clause is None
         assert query.select_clause is None
 
-    def test_invalid_field_access(self):
+    def test_invalid_field_access(self, evaluator):
         """Test handling of invalid field access"""
-        # Create minimal test dataset
-        with tempfile.TemporaryDirectory() as tmpdir:
-            # Create minimal BIDS structure
-            dataset_path = Path(tmpdir)
-            (dataset_path / "dataset_description.json").write_text(
-                '{"Name": "Test", "BIDSVersion": "1.0.0"}'
-            )
-
-            dataset = BIDSDataset(dataset_path)
-            evaluator = BIQLEvaluator(dataset)
-
-            # Query non-existent field
-            parser = BIQLParser.from_string("nonexistent_field=value")
-            query = parser.parse()
-            results = evaluator.evaluate(query)
-
-            # Should return empty results without error
-            assert len(results) == 0
+        # Query non-existent field on the shared, non-empty dataset
+        query = BIQLParser.parse_cached("nonexistent_field=value")
+        results = evaluator.evaluate(query)
+
+        # Should return empty results without error
+        assert len(results) == 0
 
 
 if __name__ == "__main__":
@@ -13,31 +13,26 @@ from biql.evaluator import BIQLEvaluator
 from biql.parser import BIQLParser
 
 
-class TestPerformance:
-    """Test BIQL performance characteristics"""
+@pytest.fixture(scope="module")
+def large_dataset(bids_examples_dir):
+    """Largest available BIDS dataset, indexed once for the module"""
+    # Try to find the largest dataset for performance testing
+    candidates = [
+        "ds000117",  # MEG dataset with many files
+        "ds107",  # Large dataset with many subjects
+        "synthetic",  # Fallback
+    ]
 
-    @pytest.fixture
-    def large_dataset(self, bids_examples_dir):
-        """Fixture for largest available BIDS dataset"""
-        # Try to find the largest dataset for performance testing
-        candidates = [
-            "ds000117",  # MEG dataset with many files
-            "ds107",  # Large dataset with many subjects
-            "synthetic",  # Fallback
-        ]
+    for candidate in candidates:
+        path = bids_examples_dir / candidate
+        if path.exists():
+            return BIDSDataset(path)
 
-        for candidate in candidates:
-            path = bids_examples_dir / candidate
-            if path.exists():
-                return BIDSDataset(path)
+    pytest.skip(f"No BIDS dataset for performance tests in {bids_examples_dir}")
 
-        # Fallback to synthetic if available
-        synthetic_path = bids_examples_dir / "synthetic"
-        if synthetic_path.exists():
-            return BIDSDataset(synthetic_path)
 
-        # If no datasets found, return synthetic dataset from conftest
-        return BIDSDataset(bids_examples_dir / "synthetic")
+class TestPerformance:
+    """Test BIQL performance characteristics"""
 
     def test_dataset_loading_performance(self, large_dataset):
         """Test dataset loading performance"""